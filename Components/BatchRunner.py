@@ -0,0 +1,323 @@
+import os
+import json
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from Components.YoutubeDownloader import download_youtube_video
+from Components.Edit import extractAudio, crop_video
+from Components.Transcription import transcribeAudio, WHISPER_MODEL
+from Components.LanguageTasks import GetHighlight
+from Components.GeminiVision import GetHighlightFromVideo
+from Components.FaceCrop import (analyze_crop_trajectory, save_trajectory, load_trajectory, render_formats,
+                                 combine_videos, format_size, DEFAULT_OUTPUT_SIZE)
+from Components.Manifest import JobManifest
+from Components.SceneDetection import CUT_THRESHOLD, STATIC_THRESHOLD
+from Components.Speaker import SPEAKER_WINDOW_S, SWITCH_MARGIN
+from Components.ClipBoundaries import SENTENCE_TOLERANCE
+from Components import Instrumentation
+
+DEFAULT_CONFIG = {
+    "mode": "transcript",                       # "transcript" or "vision"
+    "model": "gemini-2.5-flash-002",
+    "highlight_candidates": 5,                  # Candidate windows sent to the LLM for long transcripts
+    "output_size": list(DEFAULT_OUTPUT_SIZE),   # [width, height], or null for source resolution
+    "formats": None,                            # e.g. [{"aspect": "1:1", "height": 1080}], null = 9:16 at output_size
+    "stream": 0,                                # YouTube stream index, 0 = highest resolution
+    "smoothing": 0.7,                           # Crop smoothing, weight of the previous face center
+    "bitrate": "3000k",
+    "resume": True,                             # Skip stages whose inputs and settings haven't changed
+    "workspace": "jobs",                        # Each job gets its own folder in here
+    "max_jobs": 16,                             # Jobs in flight at once
+    "io_workers": 8,                            # Threads for downloads and API calls
+    "cpu_workers": None,                        # Processes for transcription/analysis/encoding, null = all cores
+    "stage_concurrency": {                      # Max jobs inside each stage at once
+        "download": 4,
+        "audio": 4,
+        "transcript": 2,
+        "highlight": 4,
+        "clip": 4,
+        "trajectory": 4,
+        "render": 4,
+    },
+}
+
+# Which pool each stage runs on: "io" = threads, "cpu" = processes
+STAGE_POOLS = {
+    "download": "io",
+    "audio": "cpu",
+    "transcript": "cpu",
+    "highlight": "io",
+    "clip": "cpu",
+    "trajectory": "cpu",
+    "render": "cpu",
+}
+
+def load_config(path=None):
+    """
+    Load a JSON batch config on top of DEFAULT_CONFIG.
+    """
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if path:
+        with open(path) as f:
+            user_config = json.load(f)
+        concurrency = user_config.pop("stage_concurrency", {})
+        config.update(user_config)
+        config["stage_concurrency"].update(concurrency)
+    return config
+
+def is_url(source):
+    return source.startswith("http://") or source.startswith("https://")
+
+def job_id(source):
+    # Stable across runs so a re-run finds the previous workspace and manifest
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+
+def resolve_formats(config):
+    """
+    Output formats of a job as [aspect, height] pairs; height None keeps the source height.
+    """
+    if config.get("formats"):
+        return [[f.get("aspect", "9:16"), f.get("height")] for f in config["formats"]]
+    output_size = config["output_size"]
+    return [["9:16", output_size[1] if output_size else None]]
+
+def final_paths(workspace, formats):
+    # A single format keeps the plain Final.mp4 name
+    if len(formats) == 1:
+        return [os.path.join(workspace, "Final.mp4")]
+    return [os.path.join(workspace, f"Final_{aspect.replace(':', 'x')}_{height or 'source'}.mp4")
+            for aspect, height in formats]
+
+def download_source(source, workspace, stream):
+    """
+    Download stage: YouTube URLs are downloaded into the job workspace,
+    local files are used in place.
+    """
+    if not is_url(source):
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"Source video not found: {source}")
+        return os.path.abspath(source)
+
+    Vid = download_youtube_video(source, output_path=os.path.join(workspace, "videos"), choice=stream)
+    if not Vid:
+        raise RuntimeError("Unable to Download the video")
+    return Vid.replace(".webm", ".mp4")
+
+def extract_audio_to_file(video_path, audio_path):
+    """
+    Audio stage: extractAudio only prints its errors, so fail the stage here.
+    """
+    if extractAudio(video_path, audio_path) is None:
+        raise RuntimeError(f"Could not extract audio from {video_path}")
+    return audio_path
+
+def transcribe_to_file(audio_path, transcript_path):
+    """
+    Transcript stage: the transcript is saved so later runs can skip Whisper.
+    """
+    transcriptions = transcribeAudio(audio_path)
+    if len(transcriptions) == 0:
+        raise RuntimeError("No transcriptions found")
+    with open(transcript_path, "w") as f:
+        json.dump(transcriptions, f)
+    return transcript_path
+
+def find_highlight(config, highlight_path, Vid=None, transcript_path=None, audio_path=None):
+    """
+    Highlight stage, runs on the I/O pool since it is dominated by the API call.
+    """
+    if config["mode"] == "vision":
+        start, stop = GetHighlightFromVideo(Vid, config["model"], interactive=False)
+    else:
+        with open(transcript_path) as f:
+            transcriptions = json.load(f)
+        start, stop = GetHighlight(transcriptions, config["model"], audio_path=audio_path,
+                                   candidates=config["highlight_candidates"])
+
+    if start is None or stop is None or start < 0 or stop <= start:
+        raise RuntimeError(f"Invalid highlight: {start} - {stop}")
+    with open(highlight_path, "w") as f:
+        json.dump({"start": start, "stop": stop}, f)
+    return [start, stop]
+
+def analyze_to_file(clip_path, trajectory_path, smoothing):
+    """
+    Trajectory stage: face and speaker analysis, saved so crops can be re-rendered without it.
+    """
+    trajectory = analyze_crop_trajectory(clip_path, debug_video_path=None, preview=False, smoothing=smoothing)
+    if trajectory is None:
+        raise RuntimeError(f"Could not analyze {clip_path}")
+    return save_trajectory(trajectory, trajectory_path)
+
+def render_short(clip_path, trajectory_path, workspace, formats, bitrate):
+    """
+    Render stage: every format is cropped from one decode of the clip, then
+    each gets its final encode, all in one worker process.
+
+    Returns:
+        List of final video paths, one per format
+    """
+    trajectory = load_trajectory(trajectory_path)
+    finals = final_paths(workspace, formats)
+    renditions = [{"aspect": aspect, "size": format_size(aspect, height),
+                   "output": os.path.join(workspace, "croped" + os.path.basename(final)[len("Final"):])}
+                  for (aspect, height), final in zip(formats, finals)]
+    for rendition in renditions:
+        if os.path.exists(rendition["output"]):
+            os.remove(rendition["output"])
+    if render_formats(clip_path, trajectory, renditions) is None:
+        raise RuntimeError(f"Could not open {clip_path}")
+    for rendition, final in zip(renditions, finals):
+        if combine_videos(clip_path, rendition["output"], final, bitrate=bitrate, fps=trajectory["fps"]) is None:
+            raise RuntimeError(f"Rendering failed, {final} was not written")
+    return finals
+
+class StageScheduler:
+    """
+    Runs pipeline stages on a shared I/O thread pool or CPU process pool,
+    with a bounded number of jobs inside each stage at once.
+    """
+
+    def __init__(self, config):
+        cpu_workers = config["cpu_workers"] or os.cpu_count() or 1
+        self.pools = {
+            "io": ThreadPoolExecutor(max_workers=config["io_workers"]),
+            # spawn avoids forking a parent that may already hold CUDA or OpenCV state
+            "cpu": ProcessPoolExecutor(max_workers=cpu_workers, mp_context=multiprocessing.get_context("spawn")),
+        }
+        self.limits = {
+            stage: threading.BoundedSemaphore(config["stage_concurrency"].get(stage, cpu_workers))
+            for stage in STAGE_POOLS
+        }
+
+    def run(self, stage, fn, *args, **kwargs):
+        with self.limits[stage]:
+            pool = STAGE_POOLS[stage]
+            if not Instrumentation.is_enabled():
+                return self.pools[pool].submit(fn, *args, **kwargs).result()
+            if pool == "io":
+                # Traced in the pool thread that does the work, so its thread CPU time is the stage's
+                return self.pools[pool].submit(Instrumentation.instrumented(stage)(fn), *args, **kwargs).result()
+            # Worker processes trace themselves and send their events back
+            result, events = self.pools[pool].submit(Instrumentation.call_traced, stage, fn, *args, **kwargs).result()
+            Instrumentation.merge(events)
+            return result
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+
+def run_job(scheduler, config, source, workspace):
+    """
+    Run one source through the full pipeline inside its own workspace.
+
+    Every stage is checkpointed in the job's manifest; with config["resume"],
+    stages whose inputs and settings are unchanged since the last run are skipped.
+
+    Returns:
+        List of final short paths, one per output format
+    """
+    os.makedirs(workspace, exist_ok=True)
+    manifest = JobManifest(workspace)
+
+    def stage(name, inputs, params, outputs, fn, *args, **kwargs):
+        fingerprint = manifest.fingerprint(inputs, params)
+        if config["resume"] and manifest.is_current(name, fingerprint):
+            print(f"[{source}] Skipping {name}, inputs unchanged")
+            return manifest.result(name)
+        if not callable(outputs):
+            # A failed re-run must not leave the previous run's files to be recorded as current
+            for path in outputs:
+                if os.path.exists(path):
+                    os.remove(path)
+        result = scheduler.run(name, fn, *args, **kwargs)
+        if callable(outputs):
+            outputs = outputs(result)
+        missing = [path for path in outputs if not path or not os.path.exists(path)]
+        if missing:
+            raise RuntimeError(f"{name} stage did not produce {missing}")
+        manifest.record(name, fingerprint, inputs, params, outputs, result)
+        return result
+
+    Vid = stage("download", {}, {"source": source, "stream": config["stream"]}, lambda path: [path],
+                download_source, source, workspace, config["stream"])
+    print(f"[{source}] Downloaded to {Vid}")
+
+    highlight_path = os.path.join(workspace, "highlight.json")
+    highlight_params = {"mode": config["mode"], "model": config["model"]}
+    if config["mode"] == "vision":
+        start, stop = stage("highlight", {"video": Vid}, highlight_params, [highlight_path],
+                            find_highlight, config, highlight_path, Vid=Vid)
+    else:
+        Audio = os.path.join(workspace, "audio.wav")
+        stage("audio", {"video": Vid}, {}, [Audio], extract_audio_to_file, Vid, Audio)
+        transcript_path = os.path.join(workspace, "transcript.json")
+        stage("transcript", {"audio": Audio}, {"model": WHISPER_MODEL, "word_timestamps": True}, [transcript_path],
+              transcribe_to_file, Audio, transcript_path)
+        highlight_params.update({"candidates": config["highlight_candidates"], "snap_tolerance": SENTENCE_TOLERANCE})
+        start, stop = stage("highlight", {"transcript": transcript_path, "audio": Audio}, highlight_params,
+                            [highlight_path], find_highlight, config, highlight_path,
+                            transcript_path=transcript_path, audio_path=Audio)
+    print(f"[{source}] Highlight identified: {start}s - {stop}s")
+
+    formats = resolve_formats(config)
+    heights = [height for _, height in formats]
+    # The clip only needs to be as tall as the tallest output
+    max_height = None if None in heights else max(heights)
+    Output = os.path.join(workspace, "Out.mp4")
+    stage("clip", {"video": Vid, "highlight": highlight_path}, {"max_height": max_height}, [Output],
+          crop_video, Vid, Output, start, stop, max_height=max_height)
+
+    trajectory_path = os.path.join(workspace, "trajectory.json")
+    trajectory_params = {"smoothing": config["smoothing"], "detector": "ssd",
+                         "cut_threshold": CUT_THRESHOLD, "static_threshold": STATIC_THRESHOLD,
+                         "speaker_window_s": SPEAKER_WINDOW_S, "switch_margin": SWITCH_MARGIN}
+    stage("trajectory", {"clip": Output}, trajectory_params,
+          [trajectory_path], analyze_to_file, Output, trajectory_path, config["smoothing"])
+
+    return stage("render", {"clip": Output, "trajectory": trajectory_path},
+                 {"formats": formats, "bitrate": config["bitrate"]}, final_paths(workspace, formats),
+                 render_short, Output, trajectory_path, workspace, formats, config["bitrate"])
+
+def run_batch(sources, config):
+    """
+    Process a list of YouTube URLs or local video files without prompting.
+
+    Jobs run concurrently; each one writes only inside <workspace>/<job id>/,
+    where the job id is derived from the source so re-runs resume in place.
+    A summary of every job is written to <workspace>/summary.json.
+
+    Returns:
+        List of {"source", "workspace", "output", "outputs", "error"} dicts, in input order;
+        output is the first format's short
+    """
+    os.makedirs(config["workspace"], exist_ok=True)
+    # Duplicate sources would share a workspace
+    sources = list(dict.fromkeys(sources))
+    scheduler = StageScheduler(config)
+
+    def process(source):
+        workspace = os.path.join(config["workspace"], job_id(source))
+        result = {"source": source, "workspace": workspace, "output": None, "outputs": [], "error": None}
+        try:
+            result["outputs"] = run_job(scheduler, config, source, workspace)
+            result["output"] = result["outputs"][0]
+            print(f"[{source}] ✓ Shorts created: {', '.join(result['outputs'])}")
+        except Exception as e:
+            result["error"] = str(e)
+            print(f"[{source}] Error: {e}")
+        return result
+
+    try:
+        # Lightweight driver threads walk jobs through the stages; the real work is bounded by the stage limits
+        with ThreadPoolExecutor(max_workers=max(1, min(len(sources), config["max_jobs"]))) as drivers:
+            results = list(drivers.map(process, sources))
+    finally:
+        scheduler.shutdown()
+
+    with open(os.path.join(config["workspace"], "summary.json"), "w") as f:
+        json.dump(results, f, indent=2)
+    Instrumentation.export_traces(config["workspace"])
+    return results
@@ -0,0 +1,147 @@
+from bisect import bisect_left, bisect_right
+from Components import Registry
+from Components.HighlightScorer import MAX_DURATION
+
+np = Registry.lazy_module("numpy")
+
+SENTENCE_TOLERANCE = 1.5   # Seconds a cut may move to land on a sentence boundary
+PAUSE_TOLERANCE = 1.0      # Seconds a cut may move to land in a pause
+MIN_PAUSE = 0.25           # Shortest gap in speech that counts as a pause
+PAD = 0.15                 # Silence kept before the first and after the last word
+MIN_CLIP = 1.0             # Shortest refined clip in seconds
+MIN_KEPT = 0.5             # Share of the original range a refined clip must still cover
+
+SENTENCE_END = (".", "?", "!")
+
+def silence_runs(speech, frame_duration_ms=30, min_pause=MIN_PAUSE):
+    """
+    (start, end) times in seconds of every VAD silence at least min_pause long.
+    """
+    silent = np.concatenate([[0], (~np.asarray(speech, dtype=bool)).astype(np.int8), [0]])
+    edges = np.diff(silent)
+    starts = np.flatnonzero(edges == 1) * frame_duration_ms / 1000
+    ends = np.flatnonzero(edges == -1) * frame_duration_ms / 1000
+    keep = ends - starts >= min_pause
+    return starts[keep], ends[keep]
+
+def boundary_points(transcriptions, timeline=None):
+    """
+    Sorted candidate cut points for a transcript.
+
+    Uses word timestamps when the transcript has them, otherwise segment
+    times. Pauses come from gaps between words and, with a speech
+    timeline (see HighlightScorer.load_speech_timeline), from the VAD.
+
+    Returns:
+        {"sentence_starts", "sentence_ends", "pause_starts", "pause_ends", "word_starts", "word_ends"},
+        each a sorted list of seconds
+    """
+    words = [word for segment in transcriptions for word in (segment[3] if len(segment) > 3 else [])]
+    if words:
+        units = [(str(text), float(start), float(end)) for text, start, end in words]
+    else:
+        units = [(str(segment[0]).strip(), float(segment[1]), float(segment[2])) for segment in transcriptions]
+
+    sentence_starts, sentence_ends, pause_starts, pause_ends = [], [], [], []
+    for i, (text, start, end) in enumerate(units):
+        if i == 0 or units[i - 1][0].endswith(SENTENCE_END):
+            sentence_starts.append(start)
+        if text.endswith(SENTENCE_END):
+            sentence_ends.append(end)
+        if i > 0 and start - units[i - 1][2] >= MIN_PAUSE:
+            pause_starts.append(units[i - 1][2])
+            pause_ends.append(start)
+
+    if timeline is not None:
+        silence_starts, silence_ends = silence_runs(timeline["speech"], timeline["frame_duration_ms"])
+        pause_starts += silence_starts.tolist()
+        pause_ends += silence_ends.tolist()
+
+    return {
+        "sentence_starts": sorted(sentence_starts),
+        "sentence_ends": sorted(sentence_ends),
+        "pause_starts": sorted(pause_starts),
+        "pause_ends": sorted(pause_ends),
+        # Segment times are too coarse to count as word boundaries
+        "word_starts": sorted(start for _, start, _ in units) if words else [],
+        "word_ends": sorted(end for _, _, end in units) if words else [],
+    }
+
+def nearest(points, t, tolerance):
+    """
+    The point closest to t within tolerance, by binary search; None if there is none.
+    """
+    i = bisect_left(points, t)
+    candidates = [points[j] for j in (i - 1, i) if 0 <= j < len(points)]
+    best = min(candidates, key=lambda p: abs(p - t), default=None)
+    if best is None or abs(best - t) > tolerance:
+        return None
+    return best
+
+def snap_start(points, t, tolerance=SENTENCE_TOLERANCE):
+    """
+    Move a clip start to a sentence start, else the end of a pause, else the start of the word it cuts.
+    """
+    word_starts, word_ends = points["word_starts"], points["word_ends"]
+    cut = nearest(points["sentence_starts"], t, tolerance)
+    if cut is None:
+        cut = nearest(points["pause_ends"], t, min(tolerance, PAUSE_TOLERANCE))
+    if cut is None:
+        i = bisect_right(word_starts, t) - 1
+        if i < 0 or word_ends[i] <= t:
+            return t
+        cut = word_starts[i]
+    # Keep a little silence in front, without reaching into the previous word
+    i = bisect_right(word_ends, cut) - 1
+    previous_end = word_ends[i] if i >= 0 else 0.0
+    return max(cut - PAD, previous_end, 0.0)
+
+def snap_end(points, t, tolerance=SENTENCE_TOLERANCE):
+    """
+    Move a clip end to a sentence end, else the start of a pause, else the end of the word it cuts.
+    """
+    word_starts, word_ends = points["word_starts"], points["word_ends"]
+    cut = nearest(points["sentence_ends"], t, tolerance)
+    if cut is None:
+        cut = nearest(points["pause_starts"], t, min(tolerance, PAUSE_TOLERANCE))
+    if cut is None:
+        i = bisect_left(word_ends, t)
+        if i >= len(word_ends) or word_starts[i] >= t:
+            return t
+        cut = word_ends[i]
+    # Let the last word ring out, without reaching into the next one
+    i = bisect_left(word_starts, cut)
+    next_start = word_starts[i] if i < len(word_starts) else float("inf")
+    return min(cut + PAD, next_start)
+
+def refine_boundaries(start, end, transcriptions, timeline=None, tolerance=SENTENCE_TOLERANCE, points=None,
+                      max_duration=MAX_DURATION):
+    """
+    Snap a highlight to clean cut points so clips don't start or end mid-word.
+
+    Args:
+        start, end: Highlight in seconds
+        transcriptions: [[text, start, end, words], ...] from transcribeAudio
+        timeline: Optional speech timeline of the video, adds VAD pauses as cut points
+        tolerance: How far (seconds) a cut may move to reach a sentence boundary
+        points: Precomputed boundary_points, to refine many ranges of one transcript
+        max_duration: Longest clip snapping may produce, unless the original was already longer
+
+    Returns:
+        (start, end), unchanged if the snapped clip would be shorter than MIN_CLIP,
+        cover less than MIN_KEPT of the original range or grow past max_duration
+    """
+    if points is None:
+        points = boundary_points(transcriptions, timeline)
+    refined_start = round(snap_start(points, start, tolerance), 3)
+    refined_end = round(snap_end(points, end, tolerance), 3)
+    kept = min(end, refined_end) - max(start, refined_start)
+    if refined_end - refined_start < MIN_CLIP:
+        return start, end
+    if end > start and kept < MIN_KEPT * (end - start):
+        return start, end
+    if refined_end - refined_start > max(max_duration, end - start):
+        return start, end
+    if (refined_start, refined_end) != (start, end):
+        print(f"Clip boundaries refined: {start}s - {end}s -> {refined_start}s - {refined_end}s")
+    return refined_start, refined_end
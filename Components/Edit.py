@@ -1,11 +1,13 @@
-from moviepy.video.io.VideoFileClip import VideoFileClip
-from moviepy.editor import VideoFileClip
 import subprocess
+import os
+from Components.Instrumentation import instrumented
 
-def extractAudio(video_path):
+@instrumented()
+def extractAudio(video_path, audio_path="audio.wav"):
+    # moviepy is imported on first use to keep startup fast
+    from moviepy.editor import VideoFileClip
     try:
         video_clip = VideoFileClip(video_path)
-        audio_path = "audio.wav"
         video_clip.audio.write_audiofile(audio_path)
         video_clip.close()
         print(f"Extracted audio to: {audio_path}")
@@ -15,10 +17,24 @@ def extractAudio(video_path):
         return None
 
 
-def crop_video(input_file, output_file, start_time, end_time):
+@instrumented()
+def crop_video(input_file, output_file, start_time, end_time, max_height=None):
+    """
+    Cut [start_time, end_time] out of input_file.
+
+    If max_height is given and the source is taller, the clip is downscaled here so
+    every later stage (speaker detection, vertical crop, final encode) reads fewer pixels.
+    """
+    from moviepy.editor import VideoFileClip
     with VideoFileClip(input_file) as video:
         cropped_video = video.subclip(start_time, end_time)
-        cropped_video.write_videofile(output_file, codec='libx264')
+        if max_height and video.h > max_height:
+            # Keep the aspect ratio with an even width for libx264
+            width = int(video.w * max_height / video.h) // 2 * 2
+            cropped_video = cropped_video.resize(newsize=(width, max_height))
+        # Keep moviepy's temporary audio next to the output instead of the CWD
+        temp_audiofile = os.path.splitext(output_file)[0] + "_temp_audio.mp3"
+        cropped_video.write_videofile(output_file, codec='libx264', temp_audiofile=temp_audiofile)
 
 # Example usage:
 if __name__ == "__main__":
@@ -1,138 +1,241 @@
-import cv2
-import numpy as np
-from moviepy.editor import *
-from Components.Speaker import detect_faces_and_speakers, Frames
+import os
+import json
+from Components.Speaker import detect_faces_and_speakers
+from Components.Instrumentation import instrumented, frame_counter
+from Components import Registry
+
+cv2 = Registry.lazy_module("cv2")
 global Fps
 
-def crop_to_vertical(input_video_path, output_video_path):
-    detect_faces_and_speakers(input_video_path, "DecOut.mp4")
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+# Common (width, height) targets for the vertical output
+OUTPUT_RESOLUTIONS = {
+    "1080p": (1080, 1920),
+    "720p": (720, 1280),
+}
+DEFAULT_OUTPUT_SIZE = OUTPUT_RESOLUTIONS["1080p"]
+
+# (width, height) ratios of the supported output formats
+ASPECT_RATIOS = {
+    "9:16": (9, 16),    # Shorts, TikTok, Reels
+    "1:1": (1, 1),      # Square feed posts
+    "4:5": (4, 5),      # Portrait feed posts
+}
+
+def even(value):
+    # libx264 with yuv420p needs even frame dimensions
+    return max(2, int(value) // 2 * 2)
+
+def get_output_size(crop_width, crop_height, output_size=DEFAULT_OUTPUT_SIZE):
+    """
+    Resolve the final frame size for a crop window.
+
+    Args:
+        crop_width, crop_height: Size of the crop window in source pixels
+        output_size: Target (width, height), or None to keep the crop size
+
+    Returns:
+        (width, height) - exactly output_size when given, so every short has the
+        chosen size (and bitrate per pixel) whatever the source resolution
+    """
+    if output_size is None:
+        return even(crop_width), even(crop_height)
+    return even(output_size[0]), even(output_size[1])
+
+def crop_size(width, height, aspect="9:16"):
+    """
+    Largest crop window with the given aspect ratio that fits in a width x height frame.
+
+    Returns:
+        (crop_width, crop_height), both even
+    """
+    (aw, ah) = ASPECT_RATIOS[aspect]
+    crop_height = min(height, width * ah / aw)
+    return even(crop_height * aw / ah), even(crop_height)
+
+def format_size(aspect, height):
+    """
+    Output (width, height) for an aspect ratio at the given height, or None for source resolution.
+    """
+    if height is None:
+        return None
+    (aw, ah) = ASPECT_RATIOS[aspect]
+    return even(height * aw / ah), even(height)
+
+@instrumented()
+def analyze_crop_trajectory(input_video_path, debug_video_path="DecOut.mp4", preview=True, smoothing=0.7):
+    """
+    Decide where the crop window should be centered on every frame.
+
+    Built from the single speaker detection pass: the crop follows the face
+    track chosen there (the active speaker, otherwise the face already being
+    followed), so the clip is decoded and searched for faces only once. The
+    result doesn't depend on the output size or aspect ratio, so it can be
+    saved and reused for any number of renders.
+
+    Args:
+        input_video_path: Path to the landscape clip
+        debug_video_path: Annotated speaker-detection video, or None to skip it
+        preview: Show speaker detection frames in a window
+        smoothing: Weight of the previous center (0 = follow the face exactly)
+
+    Returns:
+        {"width", "height", "fps", "centers", "cuts"} - centers holds the face
+        center X for each frame, or None where the frame should be center-cropped;
+        cuts holds the frame indices where a new shot starts.
+        None if the video can't be opened.
+    """
+    analysis = detect_faces_and_speakers(input_video_path, debug_video_path, preview, details=True)
+    if analysis["width"] == 0 or analysis["height"] == 0:
+        print("Error: Could not open video.")
+        return None
+
+    cuts = set(analysis["cuts"])
+    centers = []
+    last_centerX = None
+    frames = frame_counter("trajectory_frames")
+    for count, (box, followed) in enumerate(zip(analysis["boxes"], analysis["followed_ids"].tolist())):
+        if count in cuts:
+            # Hard cut: jump to the new shot instead of panning across it
+            last_centerX = None
+        if box is not None:
+            # Center the crop window on the followed face
+            centerX = int((box[0] + box[2]) // 2)
+            # Smoothing (exponential moving average) to avoid jitter
+            if last_centerX is not None:
+                centerX = int(smoothing * last_centerX + (1 - smoothing) * centerX)
+            last_centerX = centerX
+        else:
+            # Fallback: center crop (no face detected or not sure)
+            last_centerX = None  # Reset smoothing when fallback
+        centers.append(last_centerX)
+        frames.tick(followed=followed, centerX=last_centerX)
+
+    return {"width": analysis["width"], "height": analysis["height"], "fps": analysis["fps"],
+            "centers": centers, "cuts": analysis["cuts"]}
+
+def save_trajectory(trajectory, path):
+    with open(path, "w") as f:
+        json.dump(trajectory, f)
+    return path
+
+def load_trajectory(path):
+    with open(path) as f:
+        return json.load(f)
+
+@instrumented()
+def render_formats(input_video_path, trajectory, renditions):
+    """
+    Render several aspect ratios and resolutions from one decode of the clip.
 
+    Every decoded frame is cropped once per rendition around the same face
+    center from trajectory and written to that rendition's video. The crop
+    window is cut from the full frame and resized to the output size in a single step.
+
+    Args:
+        input_video_path: Path to the landscape clip the trajectory was computed on
+        trajectory: Result of analyze_crop_trajectory
+        renditions: List of {"aspect": "9:16", "size": (width, height) or None, "output": path}
+
+    Returns:
+        List of the written output paths, or None if the video can't be opened
+    """
     cap = cv2.VideoCapture(input_video_path, cv2.CAP_FFMPEG)
     if not cap.isOpened():
         print("Error: Could not open video.")
-        return
+        return None
 
     original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = cap.get(cv2.CAP_PROP_FPS)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-    vertical_height = int(original_height)
-    vertical_width = int(vertical_height * 9 / 16)
-    print(vertical_height, vertical_width)
-
-
-    if original_width < vertical_width:
-        print("Error: Original video width is less than the desired vertical width.")
-        return
-
-    x_start = (original_width - vertical_width) // 2
-    x_end = x_start + vertical_width
-    print(f"start and end - {x_start} , {x_end}")
-    print(x_end-x_start)
-    half_width = vertical_width // 2
+    centers = trajectory["centers"]
 
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video_path, fourcc, fps, (vertical_width, vertical_height))
+    targets = []
+    for rendition in renditions:
+        crop_width, crop_height = crop_size(original_width, original_height, rendition.get("aspect", "9:16"))
+        output_width, output_height = get_output_size(crop_width, crop_height, rendition.get("size"))
+        print(f"{rendition.get('aspect', '9:16')}: crop {crop_width}x{crop_height} -> output {output_width}x{output_height}")
+        targets.append({
+            "crop": (crop_width, crop_height),
+            "y_start": (original_height - crop_height) // 2,
+            "size": (output_width, output_height),
+            "resize": (output_width, output_height) != (crop_width, crop_height),
+            # Area averaging when shrinking, bicubic when a small source has to be enlarged
+            "interpolation": cv2.INTER_AREA if output_height <= crop_height else cv2.INTER_CUBIC,
+            "writer": cv2.VideoWriter(rendition["output"], fourcc, fps, (output_width, output_height)),
+        })
     global Fps
     Fps = fps
     print(fps)
     count = 0
-    last_valid_face = None
-    last_centerX = None
+    frames = frame_counter("render_frames")
     for _ in range(total_frames):
         ret, frame = cap.read()
         if not ret:
             print("Error: Could not read frame.")
             break
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-        if len(faces) > -1 and len(faces) > 0:
-            # Pick the most relevant face: closest to previous center or largest
-            if last_centerX is not None:
-                best_face = min(faces, key=lambda f: abs((f[0] + f[2] // 2) - last_centerX))
+
+        centerX = centers[count] if count < len(centers) else None
+        count += 1
+        for target in targets:
+            (crop_width, crop_height) = target["crop"]
+            if centerX is not None:
+                x_start = max(0, min(centerX - crop_width // 2, original_width - crop_width))
             else:
-                best_face = max(faces, key=lambda f: f[2] * f[3])
-            (x, y, w, h) = best_face
-            last_valid_face = (x, y, w, h)
-            # Center the crop window on the detected face's center
-            centerX = x + w // 2
-            # Optional: smoothing (simple moving average)
-            if last_centerX is not None:
-                centerX = int(0.7 * last_centerX + 0.3 * centerX)
-            last_centerX = centerX
-            x_start = max(0, min(centerX - vertical_width // 2, original_width - vertical_width))
-            x_end = x_start + vertical_width
-        else:
-            # Fallback: center crop (no face detected or not sure)
-            x_start = (original_width - vertical_width) // 2
-            x_end = x_start + vertical_width
-            last_centerX = None  # Reset smoothing when fallback
+                x_start = (original_width - crop_width) // 2
+            y_start = target["y_start"]
+            cropped_frame = frame[y_start:y_start + crop_height, x_start:x_start + crop_width]
+            if target["resize"]:
+                cropped_frame = cv2.resize(cropped_frame, target["size"], interpolation=target["interpolation"])
+            target["writer"].write(cropped_frame)
+        frames.tick(centerX=centerX)
 
-        # Only check for active face if Frames[count] is valid
-        if Frames[count] is not None and isinstance(Frames[count], (list, tuple)) and len(Frames[count]) == 4:
-            (X, Y, W, H) = Frames[count]
-        elif last_valid_face is not None:
-            (X, Y, W, H) = last_valid_face
-        else:
-            X = x_start
-            Y = 0
-            W = vertical_width
-            H = vertical_height
-
-        for f in faces:
-            x1, y1, w1, h1 = f
-            center = x1+ w1//2
-            if center > X and center < X+W:
-                x = x1
-                y = y1
-                w = w1
-                h = h1
-                break
-
-        # print(faces[0])
-        centerX = x+(w//2)
-        print(centerX)
-        print(x_start - (centerX - half_width))
-        if count == 0 or (x_start - (centerX - half_width)) <1 :
-            ## IF dif from prev fram is low then no movement is done
-            pass #use prev vals
-        else:
-            x_start = centerX - half_width
-            x_end = centerX + half_width
-
-
-            if int(cropped_frame.shape[1]) != x_end- x_start:
-                if x_end < original_width:
-                    x_end += int(cropped_frame.shape[1]) - (x_end-x_start)
-                    if x_end > original_width:
-                        x_start -= int(cropped_frame.shape[1]) - (x_end-x_start)
-                else:
-                    x_start -= int(cropped_frame.shape[1]) - (x_end-x_start)
-                    if x_start < 0:
-                        x_end += int(cropped_frame.shape[1]) - (x_end-x_start)
-                print("Frame size inconsistant")
-                print(x_end- x_start)
+    cap.release()
+    for target in targets:
+        target["writer"].release()
+    outputs = [rendition["output"] for rendition in renditions]
+    print("Cropping complete. The videos have been saved to", ", ".join(outputs), count)
+    return outputs
 
-        count += 1
-        cropped_frame = frame[:, x_start:x_end]
-        if cropped_frame.shape[1] == 0:
-            x_start = (original_width - vertical_width) // 2
-            x_end = x_start + vertical_width
-            cropped_frame = frame[:, x_start:x_end]
-        
-        print(cropped_frame.shape)
+def render_vertical(input_video_path, output_video_path, trajectory, output_size=DEFAULT_OUTPUT_SIZE):
+    """
+    Cut the 9:16 window described by trajectory out of every frame.
 
-        out.write(cropped_frame)
+    Args:
+        input_video_path: Path to the landscape clip the trajectory was computed on
+        output_video_path: Path for the vertical video (no audio)
+        trajectory: Result of analyze_crop_trajectory
+        output_size: (width, height) of the output, or None to keep the source height
+    """
+    render_formats(input_video_path, trajectory, [{"aspect": "9:16", "size": output_size, "output": output_video_path}])
 
-    cap.release()
-    out.release()
-    print("Cropping complete. The video has been saved to", output_video_path, count)
+def crop_to_vertical(input_video_path, output_video_path, output_size=DEFAULT_OUTPUT_SIZE,
+                     debug_video_path="DecOut.mp4", preview=True):
+    """
+    Crop a landscape video to 9:16, following the active speaker.
+
+    Args:
+        input_video_path: Path to the landscape clip
+        output_video_path: Path for the vertical video (no audio)
+        output_size: (width, height) of the output, or None to keep the source height
+        debug_video_path: Annotated speaker-detection video, or None to skip it
+        preview: Show speaker detection frames in a window
+    """
+    trajectory = analyze_crop_trajectory(input_video_path, debug_video_path, preview)
+    if trajectory is None:
+        return
+    render_vertical(input_video_path, output_video_path, trajectory, output_size)
 
 
 
-def combine_videos(video_with_audio, video_without_audio, output_filename):
+@instrumented()
+def combine_videos(video_with_audio, video_without_audio, output_filename, bitrate='3000k', fps=None):
+    """
+    Returns:
+        output_filename, or None if encoding failed
+    """
+    from moviepy.editor import VideoFileClip
     try:
         # Load video clips
         clip_with_audio = VideoFileClip(video_with_audio)
@@ -142,12 +245,19 @@ def combine_videos(video_with_audio, video_without_audio, output_filename):
 
         combined_clip = clip_without_audio.set_audio(audio)
 
-        global Fps
-        combined_clip.write_videofile(output_filename, codec='libx264', audio_codec='aac', fps=Fps, preset='medium', bitrate='3000k')
+        if fps is None:
+            global Fps
+            fps = Fps
+        # Keep moviepy's temporary audio next to the output instead of the CWD
+        temp_audiofile = os.path.splitext(output_filename)[0] + "_temp_audio.m4a"
+        combined_clip.write_videofile(output_filename, codec='libx264', audio_codec='aac', fps=fps, preset='medium',
+                                      bitrate=bitrate, temp_audiofile=temp_audiofile)
         print(f"Combined video saved successfully as {output_filename}")
+        return output_filename
     
     except Exception as e:
         print(f"Error combining video and audio: {str(e)}")
+        return None
 
 
 
@@ -155,7 +265,6 @@ if __name__ == "__main__":
     input_video_path = r'Out.mp4'
     output_video_path = 'Croped_output_video.mp4'
     final_video_path = 'final_video_with_audio.mp4'
-    detect_faces_and_speakers(input_video_path, "DecOut.mp4")
     crop_to_vertical(input_video_path, output_video_path)
     combine_videos(input_video_path, output_video_path, final_video_path)
 
@@ -1,17 +1,23 @@
 import os
 import time
 from dotenv import load_dotenv
-import google.generativeai as genai
 from pydantic import BaseModel, Field
+from Components.Instrumentation import instrumented
+from Components import Registry
 
 load_dotenv()
 
 gemini_api_key = os.getenv("GEMINI_API")
 
-if not gemini_api_key:
-    raise ValueError("GEMINI_API key not found. Make sure it is defined in the .env file.")
+def load_genai():
+    # Configured on first use so importing this module never needs the key
+    if not gemini_api_key:
+        raise ValueError("GEMINI_API key not found. Make sure it is defined in the .env file.")
+    import google.generativeai as genai
+    genai.configure(api_key=gemini_api_key)
+    return genai
 
-genai.configure(api_key=gemini_api_key)
+Registry.register("genai", load_genai)
 
 class VideoHighlight(BaseModel):
     """
@@ -26,17 +32,20 @@ class VideoHighlight(BaseModel):
     content: str = Field(description="Highlight Text describing the interesting part")
     end: float = Field(description="End time for the highlighted clip in seconds")
 
-def GetHighlightFromVideo(video_path, model_name="gemini-2.5-flash-002"):
+@instrumented()
+def GetHighlightFromVideo(video_path, model_name="gemini-2.5-flash-002", interactive=True):
     """
     Analyze video directly using Gemini's vision capabilities to find highlights.
     
     Args:
         video_path: Path to the video file
         model_name: Gemini model to use (gemini-2.5-flash-002, gemini-2.5-pro-002, gemini-1.5-flash, or gemini-1.5-pro)
+        interactive: Ask before retrying on errors; when False, raise instead
     
     Returns:
         Tuple of (start_time, end_time) for the highlight
     """
+    genai = Registry.get("genai")
     video_file = None
     try:
         print(f"Uploading video for analysis with {model_name}...")
@@ -132,7 +141,7 @@ def GetHighlightFromVideo(video_path, model_name="gemini-2.5-flash-002"):
                 print("Warning: Segment is longer than 60 seconds, truncating...")
                 end = start + 60
             
-            return int(start), int(end)
+            return start, end
         else:
             raise ValueError("Could not parse JSON response from Gemini")
             
@@ -141,9 +150,10 @@ def GetHighlightFromVideo(video_path, model_name="gemini-2.5-flash-002"):
         print(f"Response was: {response.text if 'response' in locals() else 'No response'}")
         
         # Fallback: ask user if they want to try again
-        Ask = input("Error - Try again? (y/n) -> ").lower()
-        if Ask == "y":
-            return GetHighlightFromVideo(video_path, model_name)
+        if interactive:
+            Ask = input("Error - Try again? (y/n) -> ").lower()
+            if Ask == "y":
+                return GetHighlightFromVideo(video_path, model_name)
         
         raise e
     
@@ -0,0 +1,265 @@
+import re
+import math
+from collections import Counter
+from Components.Instrumentation import instrumented
+from Components import Registry
+
+np = Registry.lazy_module("numpy")
+
+# Candidate highlight length in seconds
+MIN_DURATION = 15
+MAX_DURATION = 60
+
+# How much each window feature counts towards the score (features are normalized to 0-1)
+WEIGHTS = {
+    "density": 1.0,     # Words per second
+    "salience": 1.5,    # TF-IDF weight of the words, i.e. topic words rather than filler
+    "qa": 1.0,          # A question followed by its answer
+    "energy": 0.75,     # Loudness of the audio
+    "continuity": 1.0,  # Share of the window with voice activity
+    "boundary": 0.5,    # Ends on a finished sentence
+}
+
+STOPWORDS = set("""
+a about after again all also am an and any are as at be because been before being but by can could did do
+does doing don't down during each few for from had has have having he her here him his how i i'm if in into
+is it it's its just know like me more most my no not now of off on once only or other our out over own
+really right same she should so some such than that that's the their them then there these they this those
+through to too um uh under until up us very was we well were what when where which while who why will with
+would yeah you you're your
+""".split())
+
+WORD_PATTERN = re.compile(r"[a-z']+")
+
+def tokenize(text):
+    return [w for w in WORD_PATTERN.findall(text.lower()) if w not in STOPWORDS and len(w) > 2]
+
+def format_transcript(transcriptions):
+    TransText = ""
+    for text, time_start, time_end, *_ in transcriptions:
+        TransText += (f"{time_start} - {time_end}: {text}")
+    return TransText
+
+def segment_features(transcriptions):
+    """
+    Per-segment transcript features as arrays.
+
+    Returns:
+        {"start", "end", "words", "salience", "question", "sentence_end"}
+    """
+    tokens = [tokenize(segment[0]) for segment in transcriptions]
+    # Inverse document frequency, with every segment as a document
+    document_frequency = Counter(word for words in tokens for word in set(words))
+    idf = {word: math.log((1 + len(tokens)) / (1 + count)) + 1 for word, count in document_frequency.items()}
+    salience = []
+    for words in tokens:
+        counts = Counter(words)
+        salience.append(sum(count * idf[word] for word, count in counts.items()))
+    texts = [str(segment[0]).strip() for segment in transcriptions]
+    return {
+        "start": np.array([float(segment[1]) for segment in transcriptions]),
+        "end": np.array([float(segment[2]) for segment in transcriptions]),
+        "words": np.array([len(text.split()) for text in texts], dtype=float),
+        "salience": np.array(salience, dtype=float),
+        "question": np.array([text.endswith("?") for text in texts], dtype=float),
+        "sentence_end": np.array([text.endswith((".", "?", "!")) for text in texts], dtype=float),
+    }
+
+def ffmpeg_exe():
+    # moviepy ships an ffmpeg binary through imageio-ffmpeg
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except ImportError:
+        return "ffmpeg"
+
+def read_speech_timeline(audio_path, frame_duration_ms=30, chunk_frames=1000):
+    """
+    Decode any audio or video file to 16 kHz mono with ffmpeg and run the VAD over it.
+
+    The audio is streamed through in chunks and only two values per frame are
+    kept, a few tens of KB per minute of audio whatever the source format.
+
+    Returns:
+        {"speech", "power", "frame_duration_ms"} - VAD flag and mean power of every frame
+    """
+    import subprocess
+    import tempfile
+    from Components.Speaker import load_vad, voice_activity_detection
+    vad = load_vad()
+    sample_rate = 16000
+    frame_bytes = sample_rate * frame_duration_ms // 1000 * 2
+    command = [ffmpeg_exe(), "-v", "error", "-i", audio_path, "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"]
+    speech, power = [], []
+    buffer = b""
+    # stderr goes to a file: a pipe nobody reads until stdout ends can fill up and stall ffmpeg
+    with tempfile.TemporaryFile() as stderr, \
+            subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr) as process:
+        while True:
+            data = process.stdout.read(frame_bytes * chunk_frames)
+            if not data:
+                break
+            buffer += data
+            count = len(buffer) // frame_bytes
+            if count == 0:
+                continue
+            chunk, buffer = buffer[:count * frame_bytes], buffer[count * frame_bytes:]
+            frames = np.frombuffer(chunk, dtype=np.int16).reshape(count, -1).astype(np.float64)
+            power.append((frames ** 2).mean(axis=1))
+            speech.extend(voice_activity_detection(chunk[i:i + frame_bytes], sample_rate, vad)
+                          for i in range(0, len(chunk), frame_bytes))
+        process.wait()
+        stderr.seek(0)
+        errors = stderr.read().decode("utf-8", "replace").strip()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode {audio_path}: {errors}")
+    return {"speech": np.array(speech, dtype=bool),
+            "power": np.concatenate(power) if power else np.zeros(0),
+            "frame_duration_ms": frame_duration_ms}
+
+def load_speech_timeline(audio_path):
+    """
+    read_speech_timeline, or None with a message if the audio can't be used;
+    the scorer and boundary refiner then work from the transcript alone.
+    """
+    try:
+        return read_speech_timeline(audio_path)
+    except Exception as e:
+        print(f"Audio features unavailable, using the transcript only: {e}")
+        return None
+
+def audio_features(timeline, starts, ends):
+    """
+    Loudness (dB) and voice-activity share of every segment span.
+
+    Returns:
+        (energy, speech) arrays
+    """
+    # Prefix sums so every segment span is two lookups
+    frame_duration_ms = timeline["frame_duration_ms"]
+    count = len(timeline["speech"])
+    power = np.concatenate([[0.0], np.cumsum(timeline["power"])])
+    voiced = np.concatenate([[0.0], np.cumsum(timeline["speech"])])
+    first = np.clip((starts * 1000 / frame_duration_ms).astype(int), 0, count)
+    last = np.clip((ends * 1000 / frame_duration_ms).astype(int), 0, count)
+    span = np.maximum(last - first, 1)
+    energy = 10 * np.log10(np.maximum((power[last] - power[first]) / span, 1.0))
+    speech_share = (voiced[last] - voiced[first]) / span
+    return energy, speech_share
+
+def normalize(values):
+    low, high = values.min(), values.max()
+    if high - low < 1e-9:
+        return np.zeros_like(values)
+    return (values - low) / (high - low)
+
+@instrumented()
+def score_windows(transcriptions, timeline=None, min_duration=MIN_DURATION, max_duration=MAX_DURATION):
+    """
+    Score every run of consecutive segments lasting min_duration to max_duration seconds.
+
+    Window sums come from prefix sums over per-segment features, so thousands
+    of candidates are scored in one pass without any network call. A segment
+    longer than max_duration is still a candidate on its own.
+
+    Args:
+        transcriptions: [[text, start, end, words], ...] from transcribeAudio
+        timeline: Optional load_speech_timeline of the same video, adds loudness and voice activity
+
+    Returns:
+        List of {"start", "end", "first", "last", "score"} sorted best first;
+        first/last are segment indices. Empty if there are no segments.
+    """
+    if len(transcriptions) == 0:
+        return []
+    features = segment_features(transcriptions)
+    starts, ends = features["start"], features["end"]
+
+    # Every (first, last) segment pair whose span fits the length limits; segments are in time order
+    limit = np.searchsorted(ends, starts + max_duration, side="right") - 1
+    counts = np.maximum(limit - np.arange(len(starts)) + 1, 1)
+    first = np.repeat(np.arange(len(starts)), counts)
+    last = first + np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+    long_enough = ends[last] - starts[first] >= min(min_duration, ends[-1] - starts[0])
+    if long_enough.any():
+        first, last = first[long_enough], last[long_enough]
+    duration = np.maximum(ends[last] - starts[first], 1e-3)
+
+    def window_sum(values):
+        prefix = np.concatenate([[0.0], np.cumsum(values)])
+        return prefix[last + 1] - prefix[first]
+
+    words = window_sum(features["words"])
+    scores = {
+        "density": words / duration,
+        "salience": window_sum(features["salience"]) / np.maximum(words, 1),
+        # A question counts when an answer follows inside the window
+        "qa": np.minimum(window_sum(features["question"]) - features["question"][last], 1),
+        "boundary": features["sentence_end"][last],
+    }
+    if timeline is not None and len(timeline["speech"]) > 0:
+        energy, speech = audio_features(timeline, starts, ends)
+        segment_duration = np.maximum(ends - starts, 0)
+        scores["energy"] = window_sum(energy * segment_duration) / duration
+        # Gaps between segments count as silence
+        scores["continuity"] = window_sum(speech * segment_duration) / duration
+
+    total = sum(WEIGHTS[name] * normalize(values) for name, values in scores.items())
+    order = np.argsort(-total, kind="stable")
+    return [{"start": float(starts[first[i]]), "end": float(ends[last[i]]),
+             "first": int(first[i]), "last": int(last[i]), "score": round(float(total[i]), 4)} for i in order]
+
+def top_windows(transcriptions, k=5, timeline=None, min_duration=MIN_DURATION, max_duration=MAX_DURATION):
+    """
+    The k best windows that don't overlap each other.
+    """
+    selected = []
+    for window in score_windows(transcriptions, timeline, min_duration, max_duration):
+        if all(window["last"] < other["first"] or window["first"] > other["last"] for other in selected):
+            selected.append(window)
+            if len(selected) == k:
+                break
+    return selected
+
+def best_highlight(transcriptions, timeline=None):
+    """
+    Offline highlight pick, used when the LLM is unavailable or returns nothing usable.
+
+    Returns:
+        (start, end) in seconds, or (None, None) without any transcript
+    """
+    windows = top_windows(transcriptions, k=1, timeline=timeline)
+    if not windows:
+        return None, None
+    return windows[0]["start"], windows[0]["end"]
+
+def prefilter_transcript(transcriptions, k=5, timeline=None, windows=None):
+    """
+    Keep only the segments of the k best candidate windows, in time order,
+    so long videos send a much shorter prompt to the LLM.
+
+    Args:
+        windows: Precomputed top_windows, to check the answer against them afterwards
+    """
+    if windows is None:
+        windows = top_windows(transcriptions, k=k, timeline=timeline)
+    keep = sorted({i for window in windows for i in range(window["first"], window["last"] + 1)})
+    return [transcriptions[i] for i in keep]
+
+def window_overlap(start, end, windows):
+    """
+    Largest share of start-end that lies inside a single window, 0-1.
+    """
+    if end <= start:
+        return 0.0
+    overlaps = (min(end, window["end"]) - max(start, window["start"]) for window in windows)
+    return max(max(overlaps, default=0.0), 0.0) / (end - start)
+
+if __name__ == "__main__":
+    import json
+    import sys
+    with open(sys.argv[1]) as f:
+        transcriptions = json.load(f)
+    timeline = load_speech_timeline(sys.argv[2]) if len(sys.argv) > 2 else None
+    for window in top_windows(transcriptions, timeline=timeline):
+        print(window)
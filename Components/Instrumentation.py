@@ -0,0 +1,281 @@
+import os
+import sys
+import time
+import json
+import threading
+import functools
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Enabled with SHORTS_TRACE=1 (or any value other than 0/empty), or enable() at runtime.
+# When disabled every hook returns right away, so instrumented code pays one flag check.
+_enabled = os.getenv("SHORTS_TRACE", "") not in ("", "0")
+_events = []        # Finished stages
+_samples = []       # Sampled per-frame metrics
+_local = threading.local()
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def _peak_rss_mb(children=False):
+    # High-water mark over the whole life of the process (or of its waited-for children)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _current_rss_mb():
+    # Resident set size right now; Linux only
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _io_bytes():
+    # Bytes this process read and wrote through syscalls; Linux only
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def _reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM, so the next read is the peak since now; Linux only
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _stage_peak_rss_mb():
+    # VmHWM from /proc/self/status: peak RSS since the last _reset_peak_rss
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def _keep_nested_peak(record, peak):
+    if peak is not None:
+        record["_nested_peak_rss_mb"] = max(record.get("_nested_peak_rss_mb", 0.0), peak)
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+@contextmanager
+def trace_stage(name, **args):
+    """
+    Record wall time, CPU time (own and child processes such as ffmpeg),
+    frames and fps, RSS and bytes read/written for the enclosed block.
+
+    peak_rss_mb is the peak RSS during the stage, read from VmHWM after
+    resetting it through /proc/self/clear_refs (Linux only, None elsewhere).
+    process_peak_rss_mb is the high-water mark of the whole process so far,
+    children_peak_rss_mb the largest finished child process (e.g. ffmpeg) so far.
+
+    Off the main thread other stages may run at the same time, so scope is
+    "thread": cpu_s is the CPU time of this thread only, the process-wide
+    children_cpu_s and read/write bytes are left out and the peak is not reset.
+    """
+    if not _enabled:
+        yield None
+        return
+
+    threaded = threading.current_thread() is not threading.main_thread()
+    record = {"name": name, "args": args, "frames": 0, "pid": os.getpid(), "tid": threading.get_ident(),
+              "scope": "thread" if threaded else "process"}
+    record["rss_start_mb"] = _current_rss_mb()
+    parent = _stack()[-1] if _stack() else None
+    if not threaded and parent is not None:
+        # Hand the enclosing stage its peak so far before resetting it
+        _keep_nested_peak(parent, _stage_peak_rss_mb())
+    peak_reset = not threaded and _reset_peak_rss()
+    read_start, write_start = _io_bytes()
+    times_start = os.times()
+    thread_start = time.thread_time()
+    record["start_us"] = time.time_ns() // 1000
+    wall_start = time.perf_counter()
+    _stack().append(record)
+    try:
+        yield record
+    finally:
+        _stack().pop()
+        wall = time.perf_counter() - wall_start
+        thread_cpu = time.thread_time() - thread_start
+        times_end = os.times()
+        read_end, write_end = _io_bytes()
+        record["wall_s"] = round(wall, 4)
+        record["fps"] = round(record["frames"] / wall, 2) if record["frames"] and wall > 0 else None
+        record["rss_end_mb"] = _current_rss_mb()
+        record["process_peak_rss_mb"] = _peak_rss_mb()
+        record["children_peak_rss_mb"] = _peak_rss_mb(children=True)
+        if threaded:
+            record["cpu_s"] = round(thread_cpu, 4)
+            record["children_cpu_s"] = None
+        else:
+            record["cpu_s"] = round((times_end.user - times_start.user) + (times_end.system - times_start.system), 4)
+            record["children_cpu_s"] = round((times_end.children_user - times_start.children_user)
+                                             + (times_end.children_system - times_start.children_system), 4)
+            if read_start is not None and read_end is not None:
+                record["read_bytes"] = read_end - read_start
+                record["write_bytes"] = write_end - write_start
+        if peak_reset:
+            # A nested stage resets the peak too, so take the largest of what it saw
+            peak = max(_stage_peak_rss_mb() or 0.0, record.pop("_nested_peak_rss_mb", 0.0))
+            record["peak_rss_mb"] = peak or None
+            if parent is not None:
+                _keep_nested_peak(parent, record["peak_rss_mb"])
+        _events.append(record)
+
+def instrumented(name=None):
+    """
+    Decorator form of trace_stage for Components functions.
+    """
+    def decorator(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with trace_stage(stage_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class FrameCounter:
+    """
+    Counts frames for the innermost traced stage and keeps one sample of the
+    given values every sample_every frames, instead of printing every frame.
+    """
+
+    def __init__(self, name, record, sample_every):
+        self.name = name
+        self.record = record
+        self.sample_every = sample_every
+        self.start = time.perf_counter()
+
+    def tick(self, **values):
+        self.record["frames"] += 1
+        frames = self.record["frames"]
+        if frames % self.sample_every == 0:
+            elapsed = time.perf_counter() - self.start
+            values["fps"] = round(frames / elapsed, 2) if elapsed > 0 else None
+            _samples.append({"name": self.name, "frame": frames, "ts_us": time.time_ns() // 1000,
+                             "pid": self.record["pid"], "tid": self.record["tid"], "values": values})
+
+class _NullCounter:
+    def tick(self, **values):
+        pass
+
+_NULL_COUNTER = _NullCounter()
+
+def frame_counter(name, sample_every=30):
+    """
+    Returns a counter for a per-frame loop; a no-op when tracing is disabled
+    or no stage is being traced on this thread.
+    """
+    if not _enabled or not _stack():
+        return _NULL_COUNTER
+    return FrameCounter(name, _stack()[-1], sample_every)
+
+def collect():
+    """
+    Take every recorded event and sample out of this process.
+    """
+    events, samples = list(_events), list(_samples)
+    del _events[:]
+    del _samples[:]
+    return {"stages": events, "samples": samples}
+
+def merge(collected):
+    """
+    Add events collected in another process (see call_traced).
+    """
+    _events.extend(collected["stages"])
+    _samples.extend(collected["samples"])
+
+def call_traced(name, fn, *args, **kwargs):
+    """
+    Run fn as a traced stage inside a worker process. Each task takes all
+    events out of the worker when it finishes, so nothing is reported twice.
+
+    Returns:
+        (result, collected events) - merge() the events in the parent
+    """
+    enable()
+    with trace_stage(name):
+        result = fn(*args, **kwargs)
+    return result, collect()
+
+def summarize(stages):
+    summary = {}
+    for event in stages:
+        entry = summary.setdefault(event["name"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "frames": 0})
+        entry["calls"] += 1
+        entry["wall_s"] = round(entry["wall_s"] + event["wall_s"], 4)
+        entry["cpu_s"] = round(entry["cpu_s"] + event["cpu_s"] + (event["children_cpu_s"] or 0.0), 4)
+        entry["frames"] += event["frames"]
+    return summary
+
+def export_metrics(path):
+    data = {"summary": summarize(_events), "stages": _events, "samples": _samples}
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    return path
+
+def export_chrome_trace(path):
+    """
+    Write a trace-event file that chrome://tracing and Perfetto can open.
+    """
+    trace = []
+    for event in _events:
+        args = dict(event["args"])
+        for key in ("scope", "cpu_s", "children_cpu_s", "frames", "fps", "rss_start_mb", "rss_end_mb",
+                    "peak_rss_mb", "process_peak_rss_mb", "children_peak_rss_mb", "read_bytes", "write_bytes"):
+            if event.get(key) is not None:
+                args[key] = event[key]
+        trace.append({"name": event["name"], "cat": "stage", "ph": "X", "ts": event["start_us"],
+                      "dur": int(event["wall_s"] * 1e6), "pid": event["pid"], "tid": event["tid"], "args": args})
+    for sample in _samples:
+        # Counter tracks only take numbers
+        values = {key: value for key, value in sample["values"].items() if isinstance(value, (int, float))}
+        trace.append({"name": sample["name"], "cat": "frames", "ph": "C", "ts": sample["ts_us"],
+                      "pid": sample["pid"], "tid": sample["tid"], "args": values})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+    return path
+
+def export_traces(directory="."):
+    """
+    Write metrics.json and trace.json (Chrome trace events) into directory.
+    """
+    if not _enabled:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    metrics = export_metrics(os.path.join(directory, "metrics.json"))
+    trace = export_chrome_trace(os.path.join(directory, "trace.json"))
+    print(f"Performance metrics saved to {metrics}, Chrome trace saved to {trace}")
+    return metrics, trace
@@ -1,6 +1,11 @@
 from pydantic import BaseModel,Field
 from dotenv import load_dotenv
 import os
+from Components.Instrumentation import instrumented
+from Components import Registry
+from Components.HighlightScorer import (format_transcript, prefilter_transcript, best_highlight, load_speech_timeline,
+                                        top_windows, window_overlap, MAX_DURATION)
+from Components.ClipBoundaries import refine_boundaries
 
 load_dotenv()
 
@@ -52,19 +57,10 @@ IF YOU DONT HAVE ONE start AND end WHICH IS FOR THE LENGTH OF THE ENTIRE HIGHLIG
 
 
 
-def GetHighlight(Transcription, model="gemini-2.5-flash-002"):
+def load_llm(model):
     """
-    Get highlight from transcription using various AI models.
-    
-    Args:
-        Transcription: The video transcript text
-        model: Model to use - "gpt-4o", "gemini-2.5-flash-002", "gemini-2.5-pro-002", "gemini-1.5-flash", "gemini-1.5-pro"
-    
-    Returns:
-        Tuple of (start_time, end_time)
+    Build the LangChain chat client for a model name.
     """
-    from langchain.prompts import ChatPromptTemplate
-    
     # Determine which LLM to use based on model parameter
     if model.startswith("gemini"):
         if not gemini_api_key:
@@ -98,25 +94,81 @@ def GetHighlight(Transcription, model="gemini-2.5-flash-002"):
             temperature=0.7,
             api_key=openai_api_key
         )
+    return llm
+
+# Transcripts with more segments than this are pre-filtered to the best candidate windows
+PREFILTER_MIN_SEGMENTS = 60
+# With a prefiltered prompt, share of the answer that must come from one candidate window;
+# the model sees the windows back to back and may otherwise join far-apart ones
+MIN_CANDIDATE_OVERLAP = 0.5
+
+@instrumented()
+def GetHighlight(Transcription, model="gemini-2.5-flash-002", audio_path=None, candidates=5):
+    """
+    Get highlight from transcription using various AI models.
+
+    Long transcripts are narrowed down to the best local candidate windows
+    before prompting, and the local scorer picks the highlight on its own if
+    the model fails or returns an unusable clip: empty, longer than
+    MAX_DURATION, or mostly outside any single candidate window. The chosen
+    start and end are snapped to nearby sentence ends or pauses (see refine_boundaries).
+
+    Args:
+        Transcription: [[text, start, end], ...] from transcribeAudio, or the formatted transcript text
+        model: Model to use - "gpt-4o", "gemini-2.5-flash-002", "gemini-2.5-pro-002", "gemini-1.5-flash", "gemini-1.5-pro"
+        audio_path: Optional audio of the video, adds loudness and voice activity to the local scoring
+            and pauses to the boundary snapping; decoded once per call
+        candidates: Number of candidate windows sent to the model for long transcripts
+
+    Returns:
+        Tuple of (start_time, end_time)
+    """
+    transcriptions = None if isinstance(Transcription, str) else Transcription
+    timeline = None
+    windows = None
+    if transcriptions is not None:
+        timeline = load_speech_timeline(audio_path) if audio_path else None
+        prompt_segments = transcriptions
+        if len(transcriptions) > PREFILTER_MIN_SEGMENTS:
+            windows = top_windows(transcriptions, k=candidates, timeline=timeline)
+            prompt_segments = prefilter_transcript(transcriptions, windows=windows)
+            print(f"Sending {len(prompt_segments)} of {len(transcriptions)} segments to the model")
+        Transcription = format_transcript(prompt_segments)
+
+    try:
+        from langchain.prompts import ChatPromptTemplate
+
+        # One client per model, reused across calls
+        llm = Registry.get(("llm", model), lambda: load_llm(model))
+
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", system),
+                ("user", Transcription)
+            ]
+        )
 
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system),
-            ("user", Transcription)
-        ]
-    )
-    
-    chain = prompt | llm.with_structured_output(JSONResponse, method="function_calling")
-    response = chain.invoke({"Transcription": Transcription})
-    Start, End = int(response.start), int(response.end)
-    
-    if Start == End:
-        Ask = input("Error - Get Highlights again (y/n) -> ").lower()
-        if Ask == "y":
-            Start, End = GetHighlight(Transcription, model)
+        chain = prompt | llm.with_structured_output(JSONResponse, method="function_calling")
+        response = chain.invoke({"Transcription": Transcription})
+        Start, End = float(response.start), float(response.end)
+        if Start >= End:
+            raise ValueError(f"Model returned an empty highlight ({Start} - {End})")
+        if transcriptions is not None and End - Start > MAX_DURATION:
+            raise ValueError(f"Model returned a {End - Start:.1f}s highlight, longer than {MAX_DURATION}s")
+        if windows and window_overlap(Start, End, windows) < MIN_CANDIDATE_OVERLAP:
+            raise ValueError(f"Model highlight ({Start} - {End}) is not inside one candidate window")
+    except Exception as e:
+        if transcriptions is None:
+            raise
+        print(f"Highlight model failed ({e}), using the local highlight scorer")
+        Start, End = best_highlight(transcriptions, timeline=timeline)
+        if Start is None:
+            return Start, End
+
+    if transcriptions is None:
         return Start, End
-    
-    return Start, End
+    # Move the cut points off mid-word positions to sentence ends or pauses
+    return refine_boundaries(Start, End, transcriptions, timeline=timeline)
 
 if __name__ == "__main__":
     print(GetHighlight(User))
@@ -0,0 +1,89 @@
+import os
+import json
+import hashlib
+
+MANIFEST_NAME = "manifest.json"
+
+def file_hash(path, chunk_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+class JobManifest:
+    """
+    Per-job record of every pipeline stage: its inputs, parameters, output
+    artifacts and their content hashes, saved as <workspace>/manifest.json.
+
+    A stage is current when its inputs and parameters hash to the same
+    fingerprint as last time and its outputs are still on disk unchanged,
+    so re-running a job skips it.
+    """
+
+    def __init__(self, workspace):
+        self.path = os.path.join(workspace, MANIFEST_NAME)
+        self.data = {"stages": {}, "hashes": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable manifest {self.path}: {e}")
+
+    def hash(self, path):
+        """
+        Content hash of a file, cached by size and modification time so
+        large videos are only read again after they change.
+        """
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        cached = self.data["hashes"].get(key)
+        if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime_ns:
+            return cached["sha256"]
+        digest = file_hash(path)
+        self.data["hashes"][key] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def fingerprint(self, inputs, params):
+        """
+        Args:
+            inputs: {name: file path} of the files the stage reads
+            params: JSON-serializable settings that change the stage's output
+        """
+        hashed = {name: self.hash(path) for name, path in inputs.items()}
+        payload = json.dumps({"inputs": hashed, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_current(self, stage, fingerprint):
+        entry = self.data["stages"].get(stage)
+        if not entry or entry["fingerprint"] != fingerprint:
+            return False
+        for path, digest in entry["outputs"].items():
+            if not os.path.exists(path) or self.hash(path) != digest:
+                return False
+        return True
+
+    def result(self, stage):
+        return self.data["stages"][stage]["result"]
+
+    def record(self, stage, fingerprint, inputs, params, outputs, result=None):
+        """
+        Store a finished stage and save the manifest right away, so a crash in a
+        later stage keeps everything done so far.
+        """
+        self.data["stages"][stage] = {
+            "fingerprint": fingerprint,
+            "inputs": inputs,
+            "params": params,
+            "outputs": {path: self.hash(path) for path in outputs},
+            "result": result,
+        }
+        self.save()
+
+    def save(self):
+        # Write then rename so a killed process never leaves a half-written manifest
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(temp_path, self.path)
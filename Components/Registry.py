@@ -0,0 +1,64 @@
+import importlib
+import threading
+
+# Heavy modules, models and API clients are created on first use and then
+# kept for the life of the process, so each batch worker loads them once.
+_loaders = {}
+_instances = {}
+_lock = threading.RLock()
+
+def register(name, loader):
+    """
+    Register a zero-argument function that builds the component.
+    """
+    _loaders[name] = loader
+
+def get(name, loader=None):
+    """
+    Return the component, loading it on the first call.
+
+    Args:
+        name: Registered name (or any hashable key when loader is given)
+        loader: Registers this loader if the name isn't registered yet
+    """
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _instances:
+            if loader is not None and name not in _loaders:
+                register(name, loader)
+            if name not in _loaders:
+                raise KeyError(f"No component registered as {name!r}")
+            _instances[name] = _loaders[name]()
+        return _instances[name]
+
+def is_loaded(name):
+    return name in _instances
+
+def unload(name):
+    with _lock:
+        _instances.pop(name, None)
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access,
+    e.g. cv2 = LazyModule("cv2") keeps OpenCV out of import time.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        value = getattr(module, attr)
+        # Cache on the instance so later lookups skip __getattr__
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+def lazy_module(name):
+    return LazyModule(name)
@@ -0,0 +1,80 @@
+from Components import Registry
+
+cv2 = Registry.lazy_module("cv2")
+np = Registry.lazy_module("numpy")
+
+# Frames are compared as tiny grayscale thumbnails
+SIGNATURE_SIZE = (64, 36)
+HISTOGRAM_BINS = 32
+CUT_THRESHOLD = 0.35      # Histogram distance (0-1) above which two frames are in different shots
+STATIC_THRESHOLD = 2.0    # Mean pixel difference (0-255) below which the picture hasn't changed
+MAX_REUSE_FRAMES = 10     # Run detection at least this often, even in a static shot
+
+def frame_signature(frame):
+    """
+    Returns (thumbnail, histogram) for a BGR or grayscale frame of any size.
+    """
+    thumb = cv2.resize(frame, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+    if thumb.ndim == 3:
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+    histogram = np.bincount(thumb.ravel() // (256 // HISTOGRAM_BINS), minlength=HISTOGRAM_BINS).astype(np.float32)
+    histogram /= histogram.sum()
+    return thumb, histogram
+
+def histogram_distance(a, b):
+    # Total variation distance: 0 for identical histograms, 1 for disjoint ones
+    return 0.5 * float(np.abs(a - b).sum())
+
+class SceneTracker:
+    """
+    Cheap shot-boundary detector for frames that are already decoded.
+
+    Call update() once per frame. It reports hard cuts, so tracking and crop
+    smoothing can restart instead of panning across the cut. Within a shot,
+    can_reuse() says whether the picture is still close enough to the last
+    detected frame to reuse that detection.
+    """
+
+    def __init__(self, cut_threshold=CUT_THRESHOLD, static_threshold=STATIC_THRESHOLD,
+                 max_reuse_frames=MAX_REUSE_FRAMES):
+        self.cut_threshold = cut_threshold
+        self.static_threshold = static_threshold
+        self.max_reuse_frames = max_reuse_frames
+        self.index = -1
+        self.cuts = []            # Frame indices where a new shot starts
+        self.thumb = None
+        self.histogram = None
+        self.reference = None     # Thumbnail of the last frame detection ran on
+        self.reused = 0
+
+    def update(self, frame):
+        """
+        Returns True if a new shot starts at this frame.
+        """
+        self.index += 1
+        self.thumb, histogram = frame_signature(frame)
+        is_cut = self.histogram is not None and histogram_distance(histogram, self.histogram) > self.cut_threshold
+        self.histogram = histogram
+        if is_cut:
+            self.cuts.append(self.index)
+            self.reference = None
+        return is_cut
+
+    def can_reuse(self):
+        """
+        True if the last detection still applies to the current frame; counts the reuse.
+        """
+        if self.reference is None or self.reused >= self.max_reuse_frames:
+            return False
+        difference = np.abs(self.thumb.astype(np.int16) - self.reference).mean()
+        if difference > self.static_threshold:
+            return False
+        self.reused += 1
+        return True
+
+    def mark_detected(self):
+        """
+        Call after running detection on the current frame.
+        """
+        self.reference = self.thumb.astype(np.int16)
+        self.reused = 0
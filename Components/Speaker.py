@@ -1,26 +1,36 @@
-import cv2
-import numpy as np
-import webrtcvad
 import wave
 import contextlib
-from pydub import AudioSegment
 import os
+from collections import deque
+from Components.Instrumentation import instrumented, frame_counter
+from Components import Registry
+from Components.SceneDetection import SceneTracker
+from Components.SpeakerDetection import FaceTracker
+
+cv2 = Registry.lazy_module("cv2")
+np = Registry.lazy_module("numpy")
 
 # Update paths to the model files
 prototxt_path = "models/deploy.prototxt"
 model_path = "models/res10_300x300_ssd_iter_140000_fp16.caffemodel"
-temp_audio_path = "temp_audio.wav"
+TEMP_AUDIO_NAME = "temp_audio.wav"
 
-# Load DNN model
-net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+# DNN face model, loaded the first time speaker detection runs
+Registry.register("face_net", lambda: cv2.dnn.readNetFromCaffe(prototxt_path, model_path))
 
-# Initialize VAD
-vad = webrtcvad.Vad(2)  # Aggressiveness mode from 0 to 3
+def load_vad():
+    # Not kept in the Registry: a Vad carries state between frames,
+    # so every timeline gets its own instead of sharing one across jobs and threads
+    import webrtcvad
+    return webrtcvad.Vad(2)  # Aggressiveness mode from 0 to 3
 
-def voice_activity_detection(audio_frame, sample_rate=16000):
+def voice_activity_detection(audio_frame, sample_rate=16000, vad=None):
+    if vad is None:
+        vad = load_vad()
     return vad.is_speech(audio_frame, sample_rate)
 
 def extract_audio_from_video(video_path, audio_path):
+    from pydub import AudioSegment
     audio = AudioSegment.from_file(video_path)
     audio = audio.set_frame_rate(16000).set_channels(1)
     audio.export(audio_path, format="wav")
@@ -33,26 +43,152 @@ def process_audio_frame(audio_data, sample_rate=16000, frame_duration_ms=30):
         offset += n
         yield frame
 
+# Active speaker scoring: face crops are compared as small grayscale thumbnails
+FACE_THUMB_SIZE = (32, 32)
+SPEAKER_WINDOW_S = 0.5     # Mouth motion is averaged over this window
+SWITCH_MARGIN = 1.5        # A new speaker needs this much more motion than the current one
+MIN_MOUTH_ENERGY = 1.0     # Mean pixel change (0-255) below which nobody is moving their mouth
+
+def vad_timeline(audio_data, sample_rate=16000, frame_duration_ms=30, vad=None):
+    """
+    Speech flag for every frame_duration_ms chunk of 16-bit mono audio.
+
+    Args:
+        vad: Optional Vad from load_vad; a fresh one is made for this timeline otherwise
+
+    Returns:
+        Boolean array, index = time in ms // frame_duration_ms
+    """
+    if vad is None:
+        vad = load_vad()
+    return np.array([voice_activity_detection(chunk, sample_rate, vad)
+                     for chunk in process_audio_frame(audio_data, sample_rate, frame_duration_ms)], dtype=bool)
+
+def face_thumbnail(frame, box):
+    """
+    Grayscale FACE_THUMB_SIZE copy of the (x, y, w, h) box, clamped to the frame.
+    """
+    (x, y, w, h) = box
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(frame.shape[1], x + w), min(frame.shape[0], y + h)
+    if x1 <= x0 or y1 <= y0:
+        return np.zeros(FACE_THUMB_SIZE[::-1], dtype=np.uint8)
+    thumb = cv2.resize(frame[y0:y1, x0:x1], FACE_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+
+class ActiveSpeakerScorer:
+    """
+    Picks the tracked face that is talking, from mouth-region motion.
+
+    Every frame the face thumbnails of all tracks are differenced against the
+    previous frame in one NumPy operation. Motion in the bottom third (mouth)
+    minus motion in the top half (head movement, box jitter) is averaged over
+    a short window per track. The speaker only changes while the VAD hears
+    speech and another face clearly moves its mouth more.
+    """
+
+    def __init__(self, window=15, switch_margin=SWITCH_MARGIN, min_energy=MIN_MOUTH_ENERGY):
+        self.window = window
+        self.switch_margin = switch_margin
+        self.min_energy = min_energy
+        self.reset()
+
+    def reset(self):
+        self.previous = {}      # track id -> last thumbnail
+        self.history = {}       # track id -> recent mouth energies
+        self.speaker = None
+
+    def update(self, frame, tracks, speaking):
+        """
+        Args:
+            frame: BGR frame
+            tracks: List of (track id, (x, y, w, h)) from FaceTracker
+            speaking: VAD result for this frame
+
+        Returns:
+            Track id of the active speaker, or None
+        """
+        ids = [track_id for track_id, _ in tracks]
+        if not ids:
+            return None
+        thumbs = np.stack([face_thumbnail(frame, box) for _, box in tracks]).astype(np.int16)
+        previous = np.stack([self.previous.get(track_id, thumbs[k]) for k, track_id in enumerate(ids)])
+        difference = np.abs(thumbs - previous)
+        rows = thumbs.shape[1]
+        mouth = difference[:, 2 * rows // 3:, rows // 4:3 * rows // 4].mean(axis=(1, 2))
+        head = difference[:, :rows // 2].mean(axis=(1, 2))
+        energy = np.clip(mouth - head, 0, None)
+
+        self.previous = dict(zip(ids, thumbs))
+        self.history = {track_id: self.history.get(track_id, deque(maxlen=self.window)) for track_id in ids}
+        for track_id, value in zip(ids, energy):
+            self.history[track_id].append(float(value))
+        scores = np.array([sum(self.history[track_id]) / len(self.history[track_id]) for track_id in ids])
+
+        current = self.speaker if self.speaker in ids else None
+        if speaking:
+            best = int(np.argmax(scores))
+            if scores[best] >= self.min_energy and (
+                    current is None or scores[best] > self.switch_margin * scores[ids.index(current)]):
+                current = ids[best]
+        self.speaker = current
+        return current
+
 global Frames
-Frames = [] # [x,y,w,h]
+Frames = [] # [x,y,x1,y1]
+
+@instrumented()
+def detect_faces_and_speakers(input_video_path, output_video_path="DecOut.mp4", preview=True, details=False):
+    """
+    Find the face box [x, y, x1, y1] to follow in every frame.
+
+    Faces are tracked across frames and scored by mouth motion while the
+    VAD hears speech (see ActiveSpeakerScorer). The followed face is the
+    active speaker; without one, the previously followed face is kept while
+    it is still tracked, otherwise the largest face is followed.
+
+    Args:
+        input_video_path: Video to analyze
+        output_video_path: Annotated debug video, or None to skip writing it
+        preview: Show the annotated frames in a window while processing
+        details: Return the per-frame track ids, scene cuts and video size as well
 
-def detect_faces_and_speakers(input_video_path, output_video_path):
-    # Return Frams:
+    Returns:
+        Frames - one box (or None) per analyzed frame
+        With details, {"boxes": Frames, "speaker_ids", "followed_ids", "cuts", "fps", "width", "height"};
+        the id arrays are ints with -1 for no speaker / no face
+    """
     global Frames
-    # Extract audio from the video
+    Frames.clear()
+    # Extract audio next to the input so concurrent jobs don't share a temp file
+    temp_audio_path = os.path.splitext(input_video_path)[0] + "_" + TEMP_AUDIO_NAME
     extract_audio_from_video(input_video_path, temp_audio_path)
 
     # Read the extracted audio
     with contextlib.closing(wave.open(temp_audio_path, 'rb')) as wf:
         sample_rate = wf.getframerate()
         audio_data = wf.readframes(wf.getnframes())
+    os.remove(temp_audio_path)
+
+    frame_duration_ms = 30  # 30ms frames
+    speech = vad_timeline(audio_data, sample_rate, frame_duration_ms)
 
     cap = cv2.VideoCapture(input_video_path)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video_path, fourcc, 30.0, (int(cap.get(3)), int(cap.get(4))))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    width, height = int(cap.get(3)), int(cap.get(4))
+    out = None
+    if output_video_path:
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        out = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
 
-    frame_duration_ms = 30  # 30ms frames
-    audio_generator = process_audio_frame(audio_data, sample_rate, frame_duration_ms)
+    frames = frame_counter("speaker_frames")
+    net = Registry.get("face_net")
+    scenes = SceneTracker()
+    tracker = FaceTracker()
+    scorer = ActiveSpeakerScorer(window=max(1, round(fps * SPEAKER_WINDOW_S)))
+    speaker_ids = []
+    followed_ids = []
+    followed = None
 
     while cap.isOpened():
         ret, frame = cap.read()
@@ -60,79 +196,70 @@ def detect_faces_and_speakers(input_video_path, output_video_path):
             break
 
         h, w = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
-        net.setInput(blob)
-        detections = net.forward()
+        is_cut = scenes.update(frame)
+        if is_cut:
+            # New shot: new faces, and nobody has been seen talking yet
+            tracker.reset()
+            scorer.reset()
+        # Within a static shot the previous detections still hold
+        if not scenes.can_reuse():
+            blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+            net.setInput(blob)
+            detections = net.forward()[0, 0]
+            detections = detections[detections[:, 2] > 0.3]  # Confidence threshold
+            boxes = (detections[:, 3:7] * np.array([w, h, w, h])).astype(int)
+            tracker.update(np.column_stack([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]]))
+            scenes.mark_detected()
+        tracks = tracker.tracked()
 
-        audio_frame = next(audio_generator, None)
-        if audio_frame is None:
-            break
-        is_speaking_audio = voice_activity_detection(audio_frame, sample_rate)
-        MaxDif = 0
-        Add = []
-        face_found = False
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.3:  # Confidence threshold
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (x, y, x1, y1) = box.astype("int")
-                face_width = x1 - x
-                face_height = y1 - y
-
-                # Draw bounding box
-                cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
-
-                # Assuming lips are approximately at the bottom third of the face
-                lip_distance = abs((y + 2 * face_height // 3) - (y1))
-                Add.append([[x, y, x1, y1], lip_distance])
-
-                MaxDif = max(lip_distance, MaxDif)
-                face_found = True
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.3:  # Confidence threshold
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (x, y, x1, y1) = box.astype("int")
-                face_width = x1 - x
-                face_height = y1 - y
-
-                # Draw bounding box
-                cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
-
-                # Assuming lips are approximately at the bottom third of the face
-                lip_distance = abs((y + 2 * face_height // 3) - (y1))
-                print(lip_distance)
-
-                # Combine visual and audio cues
-                if lip_distance >= MaxDif and is_speaking_audio:  # Adjust the threshold as needed
-                    cv2.putText(frame, "Active Speaker", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                if lip_distance >= MaxDif:
-                    break
-
-        if face_found:
-            Frames.append([x, y, x1, y1])
+        # Align the VAD timeline with the video clock, not one audio chunk per frame
+        audio_index = int(len(speaker_ids) / fps * 1000 / frame_duration_ms)
+        is_speaking_audio = bool(audio_index < len(speech) and speech[audio_index])
+        speaker = scorer.update(frame, tracks, is_speaking_audio)
+        speaker_ids.append(-1 if speaker is None else speaker)
+
+        boxes = dict(tracks)
+        if speaker is not None:
+            followed = speaker
+        elif followed not in boxes:
+            followed = max(boxes, key=lambda i: boxes[i][2] * boxes[i][3]) if boxes else None
+        followed_ids.append(-1 if followed is None else followed)
+        if followed is not None:
+            (x, y, bw, bh) = boxes[followed]
+            Frames.append([x, y, x + bw, y + bh])
         else:
-            # If no face detected, append previous frame's values or None
-            if len(Frames) > 0:
-                Frames.append(Frames[-1])
-            else:
-                Frames.append(None)
+            # If no face is tracked, keep the previous box; the tracker was reset on a cut
+            Frames.append(Frames[-1] if len(Frames) > 0 and not is_cut else None)
+        frames.tick(faces=len(tracks), speaking=int(is_speaking_audio), speaker=speaker_ids[-1])
 
-        out.write(frame)
-        cv2.imshow('Frame', frame)
+        if out is not None or preview:
+            for track_id, (x, y, bw, bh) in tracks:
+                color = (0, 255, 0) if track_id == speaker else (0, 160, 255)
+                cv2.rectangle(frame, (x, y), (x + bw, y + bh), color, 2)
+                label = f"Active Speaker {track_id}" if track_id == speaker else str(track_id)
+                cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        if out is not None:
+            out.write(frame)
+        if preview:
+            cv2.imshow('Frame', frame)
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
 
     cap.release()
-    out.release()
-    cv2.destroyAllWindows()
-    os.remove(temp_audio_path)
-
+    if out is not None:
+        out.release()
+    if preview:
+        cv2.destroyAllWindows()
+    if details:
+        return {"boxes": Frames, "speaker_ids": np.array(speaker_ids, dtype=np.int32),
+                "followed_ids": np.array(followed_ids, dtype=np.int32), "cuts": scenes.cuts,
+                "fps": fps, "width": width, "height": height}
+    return Frames
 
 
 if __name__ == "__main__":
-    detect_faces_and_speakers()
+    detect_faces_and_speakers("Out.mp4")
     print(Frames)
     print(len(Frames))
     print(Frames[1:5])
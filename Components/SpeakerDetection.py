@@ -1,38 +1,191 @@
-import cv2
-import numpy as np
+from Components.Instrumentation import instrumented, frame_counter
+from Components import Registry
+from Components.SceneDetection import SceneTracker
+
+cv2 = Registry.lazy_module("cv2")
+np = Registry.lazy_module("numpy")
+
+def load_face_cascade():
+    return cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+Registry.register("face_cascade", load_face_cascade)
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Intersection over union between every pair of (x, y, w, h) boxes.
+
+    Returns:
+        (len(boxes_a), len(boxes_b)) array
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    left = np.maximum(a[:, None, 0], b[None, :, 0])
+    top = np.maximum(a[:, None, 1], b[None, :, 1])
+    right = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    bottom = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+    intersection = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    union = (a[:, None, 2] * a[:, None, 3]) + (b[None, :, 2] * b[None, :, 3]) - intersection
+    return intersection / np.maximum(union, 1e-6)
+
+def centroid_distance_matrix(boxes_a, boxes_b):
+    """
+    Distance between box centers, in widths of the boxes in boxes_a.
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    centers_a = a[:, :2] + a[:, 2:] / 2
+    centers_b = b[:, :2] + b[:, 2:] / 2
+    distance = np.linalg.norm(centers_a[:, None, :] - centers_b[None, :, :], axis=2)
+    return distance / np.maximum(a[:, 2:3], 1)
+
+def greedy_match(cost, max_cost):
+    """
+    Pair rows with columns, cheapest first, skipping pairs costlier than max_cost.
+
+    Returns:
+        List of (row, column)
+    """
+    pairs = []
+    if cost.size == 0:
+        return pairs
+    used_rows, used_columns = set(), set()
+    for flat in np.argsort(cost, axis=None):
+        row, column = divmod(int(flat), cost.shape[1])
+        if cost[row, column] > max_cost:
+            break
+        if row in used_rows or column in used_columns:
+            continue
+        pairs.append((row, column))
+        used_rows.add(row)
+        used_columns.add(column)
+    return pairs
+
+class FaceTracker:
+    """
+    Lightweight multi-face tracker that keeps a stable id per face.
+
+    Detections are matched to tracks by IoU first, then by centroid distance
+    for faces that moved too far to overlap. Tracks survive up to max_missed
+    frames without a detection, so short detection dropouts don't lose the face.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_distance=0.5, max_missed=15):
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.tracks = {}        # id -> {"box", "hits", "misses"}
+        self.next_id = 0
+
+    def reset(self):
+        # Forget every face, e.g. after a scene cut; ids keep increasing
+        self.tracks = {}
+
+    def update(self, detections):
+        """
+        Args:
+            detections: (x, y, w, h) boxes found in the current frame
+
+        Returns:
+            List of (track id, (x, y, w, h)) for every live track, see tracked()
+        """
+        detections = np.asarray(detections, dtype=np.float32).reshape(-1, 4)
+        ids = list(self.tracks)
+        boxes = np.array([self.tracks[i]["box"] for i in ids], dtype=np.float32).reshape(-1, 4)
+
+        pairs = greedy_match(1 - iou_matrix(boxes, detections), 1 - self.iou_threshold)
+        matched_tracks = {r for r, _ in pairs}
+        matched_detections = {c for _, c in pairs}
+        free_tracks = [r for r in range(len(ids)) if r not in matched_tracks]
+        free_detections = [c for c in range(len(detections)) if c not in matched_detections]
+        if free_tracks and free_detections:
+            distance = centroid_distance_matrix(boxes[free_tracks], detections[free_detections])
+            for r, c in greedy_match(distance, self.max_distance):
+                pairs.append((free_tracks[r], free_detections[c]))
+                matched_tracks.add(free_tracks[r])
+                matched_detections.add(free_detections[c])
+        for r, c in pairs:
+            track = self.tracks[ids[r]]
+            track["box"] = detections[c]
+            track["hits"] += 1
+            track["misses"] = 0
+        for r, track_id in enumerate(ids):
+            if r not in matched_tracks:
+                self.tracks[track_id]["misses"] += 1
+                if self.tracks[track_id]["misses"] > self.max_missed:
+                    del self.tracks[track_id]
+        for c in range(len(detections)):
+            if c not in matched_detections:
+                self.tracks[self.next_id] = {"box": detections[c], "hits": 1, "misses": 0}
+                self.next_id += 1
+        return self.tracked()
+
+    def tracked(self, min_hits=1):
+        """
+        Returns:
+            List of (track id, (x, y, w, h)) for tracks seen at least min_hits times
+        """
+        return [(track_id, tuple(int(v) for v in track["box"]))
+                for track_id, track in self.tracks.items() if track["hits"] >= min_hits]
+
+def detect_in_frame(face_cascade, frame, detection_height=360):
+    """
+    Haar face detection on a small grayscale copy, boxes in source pixels.
+    """
+    scale = min(1.0, detection_height / frame.shape[0])
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    min_face = max(24, int(30 * scale))
+    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_face, min_face))
+    if len(faces) > 0:
+        faces = (np.asarray(faces) / scale).astype(int)
+    return faces
+
 #Face Detection function
-def detect_faces(video_file):
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+@instrumented()
+def detect_faces(video_file, max_faces=5, min_hits=3):
+    """
+    Find up to max_faces distinct faces, one box per tracked face.
+
+    A face counts once it has been tracked for min_hits frames, so the same
+    face moving by a few pixels is not counted again. Stops at the end of the video.
+    """
+    face_cascade = Registry.get("face_cascade")
 
     # Load the video
     cap = cv2.VideoCapture(video_file)
 
-    faces = []
+    tracker = FaceTracker()
+    faces = {}      # track id -> last box
+    frames = frame_counter("detect_faces_frames")
 
     # Detect and store unique faces
-    while len(faces) < 5:
+    while len(faces) < max_faces:
         ret, frame = cap.read()
-        if ret:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            detected_faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-
-            # Iterate through the detected faces
-            for face in detected_faces:
-                # Check if the face is already in the list of faces
-                if not any(np.array_equal(face, f) for f in faces):
-                    faces.append(face)
+        if not ret:
+            break
+        tracker.update(detect_in_frame(face_cascade, frame))
+        for track_id, box in tracker.tracked(min_hits):
+            if track_id in faces or len(faces) < max_faces:
+                faces[track_id] = box
 
-            # Print the number of unique faces detected so far
-            print(f"Number of unique faces detected: {len(faces)}")
+        # Sample the number of unique faces detected so far
+        frames.tick(unique_faces=len(faces))
 
     # Release the video capture object
     cap.release()
 
     # If faces detected, return the list of faces
     if len(faces) > 0:
-        return faces
-    
-def crop_video(faces, input_file, output_file):
+        return list(faces.values())
+
+@instrumented()
+def crop_video(faces, input_file, output_file, face_index=0):
+    """
+    Crop a vertical video that follows one face through the whole clip.
+
+    The face at faces[face_index] is matched to a track on the first frames
+    and that track is followed; detection is skipped while the shot is static.
+    """
     try:
         if len(faces) > 0:
             # Constants for cropping
@@ -41,10 +194,12 @@ def crop_video(faces, input_file, output_file):
 
             # Read the input video
             cap = cv2.VideoCapture(input_file)
+            face_cascade = Registry.get("face_cascade")
 
             # Get the frame dimensions
             frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
 
             # Calculate the target width and height for cropping (vertical format)
             target_height = int(frame_height * CROP_RATIO)
@@ -52,9 +207,15 @@ def crop_video(faces, input_file, output_file):
 
             # Create a VideoWriter object to save the output video
             fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-            output_video = cv2.VideoWriter(output_file, fourcc, 30.0, (target_width, target_height))
+            output_video = cv2.VideoWriter(output_file, fourcc, fps, (target_width, target_height))
+
+            tracker = FaceTracker()
+            scenes = SceneTracker()
+            target = faces[face_index]
+            followed = None
 
             # Loop through each frame of the input video
+            frames = frame_counter("crop_video_frames")
             while True:
                 ret, frame = cap.read()
 
@@ -62,25 +223,40 @@ def crop_video(faces, input_file, output_file):
                 if not ret:
                     break
 
-                # Iterate through each detected face
-                for face in faces:
-                    # Unpack the face coordinates
-                    x, y, w, h = face
+                if scenes.update(frame):
+                    # New shot, new faces
+                    tracker.reset()
+                if not scenes.can_reuse():
+                    tracker.update(detect_in_frame(face_cascade, frame))
+                    scenes.mark_detected()
 
-                    # Calculate the crop coordinates
-                    crop_x = max(0, x + (w - target_width) // 2)  # Adjust the crop region to center the face
-                    crop_y = max(0, y + (h - target_height) // 2)
-                    crop_x2 = min(crop_x + target_width, frame_width)
-                    crop_y2 = min(crop_y + target_height, frame_height)
+                tracks = dict(tracker.tracked())
+                if followed not in tracks and tracks:
+                    # (Re)acquire the track closest to the chosen face
+                    ids = list(tracks)
+                    overlap = iou_matrix([target], [tracks[i] for i in ids])[0]
+                    distance = centroid_distance_matrix([target], [tracks[i] for i in ids])[0]
+                    followed = ids[int(np.argmax(overlap))] if overlap.max() > 0 else ids[int(np.argmin(distance))]
+                if followed in tracks:
+                    target = tracks[followed]
 
-                    # Crop the frame based on the calculated crop coordinates
-                    cropped_frame = frame[crop_y:crop_y2, crop_x:crop_x2]
+                # Unpack the face coordinates
+                x, y, w, h = target
 
-                    # Resize the cropped frame to the target dimensions
-                    resized_frame = cv2.resize(cropped_frame, (target_width, target_height))
+                # Calculate the crop coordinates, centered on the face and kept inside the frame
+                crop_x = min(max(0, x + (w - target_width) // 2), max(0, frame_width - target_width))
+                crop_y = min(max(0, y + (h - target_height) // 2), max(0, frame_height - target_height))
 
-                    # Write the resized frame to the output video
-                    output_video.write(resized_frame)
+                # Crop the frame based on the calculated crop coordinates
+                cropped_frame = frame[crop_y:crop_y + target_height, crop_x:crop_x + target_width]
+
+                # Resize only if the frame was too small for the target
+                if cropped_frame.shape[:2] != (target_height, target_width):
+                    cropped_frame = cv2.resize(cropped_frame, (target_width, target_height))
+
+                # Write one output frame per input frame
+                output_video.write(cropped_frame)
+                frames.tick(track=followed)
 
             cap.release()
             output_video.release()
@@ -99,5 +275,3 @@ if __name__ == "__main__":
     print(faces)
     crop_video(faces, input, "Cropped.mp4")
     print("DONE")
-
-    
\ No newline at end of file
@@ -1,17 +1,38 @@
-from faster_whisper import WhisperModel
-import torch
+from Components.Instrumentation import instrumented
+from Components import Registry
 
-def transcribeAudio(audio_path):
+WHISPER_MODEL = "base.en"
+
+def load_whisper():
+    # Imported here so only processes that transcribe pay for faster_whisper
+    import ctranslate2
+    from faster_whisper import WhisperModel
+    Device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    print(Device)
+    model = WhisperModel(WHISPER_MODEL, device=Device)
+    print("Model loaded")
+    return model
+
+Registry.register("whisper", load_whisper)
+
+@instrumented()
+def transcribeAudio(audio_path, word_timestamps=True):
+    """
+    Returns:
+        [[text, start, end, words], ...] - words is [[word, start, end], ...],
+        empty when word_timestamps is False
+    """
     try:
         print("Transcribing audio...")
-        Device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(Device)
-        model = WhisperModel("base.en", device="cuda" if torch.cuda.is_available() else "cpu")
-        print("Model loaded")
-        segments, info = model.transcribe(audio=audio_path, beam_size=5, language="en", max_new_tokens=128, condition_on_previous_text=False)
+        # Loaded once per process and reused for every later transcription
+        model = Registry.get("whisper")
+        segments, info = model.transcribe(audio=audio_path, beam_size=5, language="en", max_new_tokens=128,
+                                          condition_on_previous_text=False, word_timestamps=word_timestamps)
         segments = list(segments)
         # print(segments)
-        extracted_texts = [[segment.text, segment.start, segment.end] for segment in segments]
+        extracted_texts = [[segment.text, segment.start, segment.end,
+                            [[word.word.strip(), word.start, word.end] for word in (segment.words or [])]]
+                           for segment in segments]
         return extracted_texts
     except Exception as e:
         print("Transcription Error:", e)
@@ -23,6 +44,6 @@ if __name__ == "__main__":
     # print("Done")
     TransText = ""
 
-    for text, start, end in transcriptions:
+    for text, start, end, words in transcriptions:
         TransText += (f"{start} - {end}: {text}")
     print(TransText)
\ No newline at end of file
@@ -1,12 +1,26 @@
 import os
-from pytubefix import YouTube
-import ffmpeg
+from Components.Instrumentation import instrumented
 
 def get_video_size(stream):
 
     return stream.filesize / (1024 * 1024)
 
-def download_youtube_video(url):
+@instrumented()
+def download_youtube_video(url, output_path='videos', choice=None):
+    """
+    Download a YouTube video (merging adaptive video and audio streams).
+
+    Args:
+        url: YouTube URL
+        output_path: Folder to save the video in
+        choice: Index into the streams sorted by resolution (0 = highest), or None to ask
+
+    Returns:
+        Path of the downloaded .mp4, or None on failure
+    """
+    # Imported on first use to keep startup fast
+    from pytubefix import YouTube
+    import ffmpeg
     try:
         yt = YouTube(url)
 
@@ -19,21 +33,22 @@ def download_youtube_video(url):
             stream_type = "Progressive" if stream.is_progressive else "Adaptive"
             print(f"{i}. Resolution: {stream.resolution}, Size: {size:.2f} MB, Type: {stream_type}")
 
-        choice = int(input("Enter the number of the video stream to download: "))
+        if choice is None:
+            choice = int(input("Enter the number of the video stream to download: "))
         selected_stream = video_streams[choice]
 
-        if not os.path.exists('videos'):
-            os.makedirs('videos')
+        if not os.path.exists(output_path):
+            os.makedirs(output_path)
 
         print(f"Downloading video: {yt.title}")
-        video_file = selected_stream.download(output_path='videos', filename_prefix="video_")
+        video_file = selected_stream.download(output_path=output_path, filename_prefix="video_")
 
         if not selected_stream.is_progressive:
             print("Downloading audio...")
-            audio_file = audio_stream.download(output_path='videos', filename_prefix="audio_")
+            audio_file = audio_stream.download(output_path=output_path, filename_prefix="audio_")
 
             print("Merging video and audio...")
-            output_file = os.path.join('videos', f"{yt.title}.mp4")
+            output_file = os.path.join(output_path, f"{yt.title}.mp4")
             stream = ffmpeg.input(video_file)
             audio = ffmpeg.input(audio_file)
             stream = ffmpeg.output(stream, audio, output_file, vcodec='libx264', acodec='aac', strict='experimental')
@@ -45,7 +60,7 @@ def download_youtube_video(url):
             output_file = video_file
 
         
-        print(f"Downloaded: {yt.title} to 'videos' folder")
+        print(f"Downloaded: {yt.title} to '{output_path}' folder")
         print(f"File path: {output_file}")
         return output_file
 
@@ -0,0 +1,37 @@
+import argparse
+import json
+
+from Components.BatchRunner import load_config, run_batch
+
+def read_sources(args):
+    sources = list(args.sources)
+    if args.list:
+        with open(args.list) as f:
+            sources += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return sources
+
+def main():
+    parser = argparse.ArgumentParser(description="Create shorts for many videos without prompts.")
+    parser.add_argument("sources", nargs="*", help="YouTube URLs or local video files")
+    parser.add_argument("--list", help="Text file with one URL or file path per line")
+    parser.add_argument("--config", help="JSON config file (see DEFAULT_CONFIG in Components/BatchRunner.py)")
+    args = parser.parse_args()
+
+    sources = read_sources(args)
+    if not sources:
+        parser.error("No sources given")
+
+    config = load_config(args.config)
+    print(f"Running {len(sources)} job(s) with config:\n{json.dumps(config, indent=2)}")
+    results = run_batch(sources, config)
+
+    failed = [r for r in results if r["error"]]
+    print("\n" + "="*60)
+    print(f"✓ {len(results) - len(failed)} succeeded, {len(failed)} failed")
+    for r in failed:
+        print(f"  {r['source']}: {r['error']}")
+    print("="*60)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
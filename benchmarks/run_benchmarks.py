@@ -0,0 +1,263 @@
+"""
+Offline benchmarks for every pipeline stage.
+
+Generates deterministic synthetic videos (moving face-like patches, scene cuts,
+speech/silence audio), runs each stage on them in a fresh worker process and
+writes fps, latency and peak memory (of the stage process and of its ffmpeg
+children) to JSON. Inputs a stage needs from earlier stages are built in a
+separate process first, so they don't count towards the stage. With --baseline, exits with status 1
+when a stage is slower or uses more memory than the baseline by more than --threshold.
+
+    python benchmarks/run_benchmarks.py --resolutions 720p,1080p --fps 30,60
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/baseline.json --threshold 0.15
+
+The LLM and Gemini calls are replaced by local stubs (see stubs.py). transcribeAudio
+needs the Whisper model to be cached locally; stages that fail are reported, not fatal.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import make_video, RESOLUTIONS
+
+# Metrics where a higher value is a regression
+COMPARED_METRICS = ("wall_s", "peak_rss_mb", "children_peak_rss_mb")
+
+def case_crop_video(meta, workdir, setup):
+    from Components.Edit import crop_video
+    output = os.path.join(workdir, "clip.mp4")
+    start, end = 0.5, meta["seconds"] - 0.5
+    return (lambda: crop_video(meta["video"], output, start, end)), int((end - start) * meta["fps"])
+
+def case_detect_faces_and_speakers(meta, workdir, setup):
+    from Components.Speaker import detect_faces_and_speakers
+    return (lambda: detect_faces_and_speakers(meta["video"], None, preview=False)), meta["frames"]
+
+def case_analyze_crop_trajectory(meta, workdir, setup):
+    from Components.FaceCrop import analyze_crop_trajectory
+    return (lambda: analyze_crop_trajectory(meta["video"], None, preview=False)), meta["frames"]
+
+def setup_trajectory(meta, setup_dir):
+    from Components.FaceCrop import analyze_crop_trajectory, save_trajectory
+    trajectory = analyze_crop_trajectory(meta["video"], None, preview=False)
+    return {"trajectory": save_trajectory(trajectory, os.path.join(setup_dir, "trajectory.json"))}
+
+def case_render_vertical(meta, workdir, setup):
+    from Components.FaceCrop import load_trajectory, render_vertical
+    trajectory = load_trajectory(setup["trajectory"])
+    output = os.path.join(workdir, "vertical.mp4")
+    return (lambda: render_vertical(meta["video"], output, trajectory)), meta["frames"]
+
+def case_crop_to_vertical(meta, workdir, setup):
+    from Components.FaceCrop import crop_to_vertical
+    output = os.path.join(workdir, "vertical.mp4")
+    return (lambda: crop_to_vertical(meta["video"], output, debug_video_path=None, preview=False)), meta["frames"]
+
+def setup_vertical(meta, setup_dir):
+    from Components.FaceCrop import crop_to_vertical
+    vertical = os.path.join(setup_dir, "vertical.mp4")
+    crop_to_vertical(meta["video"], vertical, debug_video_path=None, preview=False)
+    return {"vertical": vertical}
+
+def case_combine_videos(meta, workdir, setup):
+    from Components.FaceCrop import combine_videos
+    output = os.path.join(workdir, "final.mp4")
+    return (lambda: combine_videos(meta["video"], setup["vertical"], output, fps=meta["fps"])), meta["frames"]
+
+def case_transcribeAudio(meta, workdir, setup):
+    from Components.Transcription import transcribeAudio
+
+    def measured():
+        if not transcribeAudio(meta["audio"]):
+            raise RuntimeError("transcribeAudio returned nothing (is the Whisper model cached?)")
+    return measured, None
+
+def case_pipeline(meta, workdir, setup):
+    from benchmarks import stubs
+    stubs.install(meta["seconds"])
+    from Components.BatchRunner import load_config, run_batch
+    config = load_config()
+    config.update({"mode": "vision", "workspace": os.path.join(workdir, "jobs"), "resume": False, "cpu_workers": 2})
+
+    def measured():
+        result = run_batch([meta["video"]], config)[0]
+        if result["error"]:
+            raise RuntimeError(result["error"])
+    return measured, meta["frames"]
+
+def case_startup(meta, workdir, setup):
+    # Cold start of a fresh interpreter importing the entry points
+    command = [sys.executable, "-c", "import main, Components.BatchRunner"]
+    return (lambda: subprocess.run(command, cwd=ROOT, check=True)), None
+
+CASES = {
+    "startup": case_startup,
+    "crop_video": case_crop_video,
+    "detect_faces_and_speakers": case_detect_faces_and_speakers,
+    "analyze_crop_trajectory": case_analyze_crop_trajectory,
+    "render_vertical": case_render_vertical,
+    "crop_to_vertical": case_crop_to_vertical,
+    "combine_videos": case_combine_videos,
+    "transcribeAudio": case_transcribeAudio,
+    "pipeline": case_pipeline,
+}
+
+# Inputs a stage needs from earlier stages. They are built in a process of their
+# own, so the measured process's memory and CPU only cover the stage itself.
+SETUPS = {
+    "render_vertical": setup_trajectory,
+    "combine_videos": setup_vertical,
+}
+
+# Stages that don't depend on the video resolution only run on the first input
+RUN_ONCE = {"startup", "transcribeAudio"}
+
+def run_setup(name, meta, setup_dir):
+    os.makedirs(setup_dir, exist_ok=True)
+    return SETUPS[name](meta, setup_dir)
+
+def run_case(name, meta, workdir, setup):
+    """
+    Runs in a fresh worker process: one traced run of the stage, with the
+    artifacts from run_setup passed in.
+    """
+    from Components import Instrumentation
+    os.makedirs(workdir, exist_ok=True)
+    measured, frames = CASES[name](meta, workdir, setup)
+    Instrumentation.enable()
+    with Instrumentation.trace_stage(name) as record:
+        measured()
+    nested = Instrumentation.summarize(Instrumentation.collect()["stages"])
+    nested.pop(name, None)
+    return {
+        "wall_s": record["wall_s"],
+        "cpu_s": round(record["cpu_s"] + record["children_cpu_s"], 4),
+        # Each case runs in a fresh process, so the process peak is the stage's peak
+        "peak_rss_mb": record["process_peak_rss_mb"],
+        # Largest finished child process, e.g. the ffmpeg encoders behind moviepy
+        "children_peak_rss_mb": record["children_peak_rss_mb"],
+        "frames": frames,
+        "fps": round(frames / record["wall_s"], 2) if frames and record["wall_s"] > 0 else None,
+        "stages": nested,
+    }
+
+def in_fresh_process(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+def measure(name, meta, workdir, repeat):
+    setup = None
+    if name in SETUPS:
+        setup_dir = os.path.join(workdir, "setup")
+        shutil.rmtree(setup_dir, ignore_errors=True)
+        setup = in_fresh_process(run_setup, name, meta, setup_dir)
+    run_dir = os.path.join(workdir, "run")
+    runs = []
+    for _ in range(repeat):
+        shutil.rmtree(run_dir, ignore_errors=True)
+        # A new process per run so peak RSS and model loading are measured per stage
+        runs.append(in_fresh_process(run_case, name, meta, run_dir, setup))
+    result = min(runs, key=lambda r: r["wall_s"])
+    result["wall_s_median"] = round(statistics.median(r["wall_s"] for r in runs), 4)
+    for metric in ("peak_rss_mb", "children_peak_rss_mb"):
+        result[metric] = max((r[metric] for r in runs if r[metric] is not None), default=None)
+    result["runs"] = repeat
+    return result
+
+def compare(results, baseline, threshold):
+    """
+    Returns a list of (case, metric, baseline value, current value) regressions.
+    """
+    regressions = []
+    for case, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(case)
+        if not previous or "error" in current or "error" in previous:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if old and new and new > old * (1 + threshold):
+                regressions.append((case, metric, old, new))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the shorts pipeline.")
+    parser.add_argument("--resolutions", default="720p,1080p", help=f"Comma-separated, from {', '.join(RESOLUTIONS)}")
+    parser.add_argument("--fps", default="30", help="Comma-separated input frame rates")
+    parser.add_argument("--seconds", type=int, default=6, help="Length of each synthetic video")
+    parser.add_argument("--stages", default=",".join(CASES), help="Comma-separated stages to run")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the fastest is reported")
+    parser.add_argument("--cache", default=os.path.join(ROOT, "benchmarks", ".cache"), help="Synthetic input folder")
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results", "latest.json"))
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown/memory growth, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = [s for s in stages if s not in CASES]
+    if unknown:
+        parser.error(f"Unknown stages: {unknown}")
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seconds": args.seconds,
+        },
+        "cases": {},
+    }
+    inputs = [(res, int(fps)) for res in args.resolutions.split(",") for fps in args.fps.split(",")]
+    for index, (resolution, fps) in enumerate(inputs):
+        print(f"Generating synthetic {resolution} {fps}fps input...")
+        meta = make_video(args.cache, resolution, fps, args.seconds)
+        for stage in stages:
+            if stage in RUN_ONCE and index > 0:
+                continue
+            if stage == "startup":
+                case = stage
+            elif stage in RUN_ONCE:
+                case = f"{stage}@{args.seconds}s"
+            else:
+                case = f"{stage}@{resolution}{fps}"
+            workdir = os.path.join(args.cache, "work", case.replace("@", "_"))
+            print(f"Running {case}...")
+            try:
+                result = measure(stage, meta, workdir, args.repeat)
+                print(f"  {result['wall_s']:.3f}s, fps={result['fps']}, peak RSS={result['peak_rss_mb']} MB, "
+                      f"children={result['children_peak_rss_mb']} MB")
+            except Exception as e:
+                result = {"error": str(e)}
+                print(f"  Error: {e}")
+            results["cases"][case] = result
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for case, metric, old, new in regressions:
+            print(f"REGRESSION {case} {metric}: {old} -> {new} (+{(new / old - 1) * 100:.1f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold * 100:.0f}% compared to {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
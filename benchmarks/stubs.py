@@ -0,0 +1,27 @@
+def stub_highlight(duration):
+    """
+    Local stand-in for the LLM: always picks the middle of the video.
+    """
+    start, end = duration * 0.2, duration * 0.8
+
+    def GetHighlight(Transcription, model=None, audio_path=None, candidates=5):
+        return start, end
+
+    def GetHighlightFromVideo(video_path, model_name=None, interactive=True):
+        return start, end
+
+    return GetHighlight, GetHighlightFromVideo
+
+def install(duration):
+    """
+    Replace the LLM and Gemini calls so the pipeline runs offline.
+    """
+    GetHighlight, GetHighlightFromVideo = stub_highlight(duration)
+
+    import Components.LanguageTasks
+    import Components.GeminiVision
+    import Components.BatchRunner
+    Components.LanguageTasks.GetHighlight = GetHighlight
+    Components.GeminiVision.GetHighlightFromVideo = GetHighlightFromVideo
+    Components.BatchRunner.GetHighlight = GetHighlight
+    Components.BatchRunner.GetHighlightFromVideo = GetHighlightFromVideo
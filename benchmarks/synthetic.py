@@ -0,0 +1,140 @@
+import os
+import json
+import wave
+import subprocess
+import numpy as np
+import cv2
+from Components.HighlightScorer import ffmpeg_exe
+
+# Named input sizes (width, height)
+RESOLUTIONS = {
+    "360p": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "2160p": (3840, 2160),
+}
+
+SAMPLE_RATE = 16000
+
+def speech_pattern(seconds, speech_s=2.0, silence_s=1.0):
+    """
+    Alternating speech/silence intervals as a list of (start, end, is_speech).
+    """
+    intervals = []
+    t = 0.0
+    speaking = True
+    while t < seconds:
+        length = speech_s if speaking else silence_s
+        intervals.append((t, min(seconds, t + length), speaking))
+        t += length
+        speaking = not speaking
+    return intervals
+
+def make_audio(path, seconds, seed=0):
+    """
+    Write a 16 kHz mono WAV with speech-like bursts (voiced harmonics with a
+    syllable-rate envelope plus noise) separated by silence.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    audio = np.zeros_like(t)
+    for start, end, is_speech in speech_pattern(seconds):
+        if not is_speech:
+            continue
+        mask = (t >= start) & (t < end)
+        local = t[mask] - start
+        f0 = 120 + 60 * np.sin(2 * np.pi * 0.5 * local)
+        phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+        envelope = 0.5 * (1 - np.cos(2 * np.pi * 4 * local))  # ~4 syllables per second
+        audio[mask] = 0.3 * voiced * envelope + 0.02 * rng.standard_normal(mask.sum())
+    samples = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(samples.tobytes())
+    return path
+
+def draw_face(frame, cx, cy, size, mouth_open):
+    # Skin-toned oval with eyes and a mouth whose height follows mouth_open (0-1)
+    w, h = int(size * 0.8), size
+    cv2.ellipse(frame, (cx, cy), (w // 2, h // 2), 0, 0, 360, (150, 180, 225), -1)
+    eye_y = cy - h // 8
+    for dx in (-w // 5, w // 5):
+        cv2.ellipse(frame, (cx + dx, eye_y), (w // 10, h // 20), 0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(frame, (cx + dx, eye_y), max(1, h // 30), (40, 30, 30), -1)
+    cv2.line(frame, (cx - w // 5, eye_y - h // 10), (cx - w // 12, eye_y - h // 9), (60, 50, 50), max(1, h // 60))
+    cv2.line(frame, (cx + w // 12, eye_y - h // 9), (cx + w // 5, eye_y - h // 10), (60, 50, 50), max(1, h // 60))
+    mouth_h = max(1, int(h // 40 + mouth_open * h // 12))
+    cv2.ellipse(frame, (cx, cy + h // 4), (w // 6, mouth_h), 0, 0, 360, (60, 40, 120), -1)
+
+def make_frames(width, height, fps, seconds, seed=0, cut_every=4.0):
+    """
+    Yield deterministic BGR frames: a textured background that changes at every
+    cut, one face moving left to right and one static face. The moving face
+    "speaks" (mouth moves) during the speech intervals of speech_pattern.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(round(fps * seconds))
+    speech = speech_pattern(seconds)
+    size = height // 3
+    backgrounds = {}
+    for i in range(total):
+        t = i / fps
+        shot = int(t // cut_every)
+        if shot not in backgrounds:
+            base = rng.integers(30, 200, size=3)
+            gradient = np.linspace(0.6, 1.0, width, dtype=np.float32)[None, :, None]
+            background = np.empty((height, width, 3), np.uint8)
+            background[:] = (base * gradient).astype(np.uint8)
+            noise = rng.integers(0, 12, size=(height // 8 + 1, width // 8 + 1, 1), dtype=np.uint8)
+            background += cv2.resize(noise, (width, height), interpolation=cv2.INTER_NEAREST)[:, :, None]
+            backgrounds = {shot: background}
+        frame = backgrounds[shot].copy()
+
+        speaking = any(start <= t < end and is_speech for start, end, is_speech in speech)
+        mouth = 0.5 * (1 - np.cos(2 * np.pi * 4 * t)) if speaking else 0.0
+        # Faces swap sides at every cut
+        left, right = (0.25, 0.75) if shot % 2 == 0 else (0.75, 0.25)
+        moving_x = int(width * (left + 0.1 * np.sin(2 * np.pi * t / cut_every)))
+        draw_face(frame, moving_x, height // 2, size, mouth)
+        draw_face(frame, int(width * right), height // 2, int(size * 0.8), 0.0)
+        yield frame
+
+def make_video(directory, resolution="720p", fps=30, seconds=6, seed=0):
+    """
+    Create (or reuse) a synthetic H.264/AAC test video and its WAV audio.
+
+    Returns:
+        {"video", "audio", "width", "height", "fps", "seconds", "frames"}
+    """
+    width, height = RESOLUTIONS[resolution]
+    name = f"synthetic_{resolution}_{fps}fps_{seconds}s_seed{seed}"
+    video_path = os.path.join(directory, name + ".mp4")
+    audio_path = os.path.join(directory, name + ".wav")
+    meta_path = os.path.join(directory, name + ".json")
+    if os.path.exists(video_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            return json.load(f)
+
+    os.makedirs(directory, exist_ok=True)
+    make_audio(audio_path, seconds, seed)
+    silent_path = os.path.join(directory, name + "_silent.mp4")
+    writer = cv2.VideoWriter(silent_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    frames = 0
+    for frame in make_frames(width, height, fps, seconds, seed):
+        writer.write(frame)
+        frames += 1
+    writer.release()
+
+    subprocess.run([ffmpeg_exe(), "-y", "-loglevel", "error", "-i", silent_path, "-i", audio_path,
+                    "-c:v", "libx264", "-preset", "veryfast", "-crf", "20", "-pix_fmt", "yuv420p",
+                    "-c:a", "aac", "-shortest", video_path], check=True)
+    os.remove(silent_path)
+
+    meta = {"video": video_path, "audio": audio_path, "width": width, "height": height,
+            "fps": fps, "seconds": seconds, "frames": frames}
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return meta
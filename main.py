@@ -3,7 +3,8 @@ from Components.Edit import extractAudio, crop_video
 from Components.Transcription import transcribeAudio
 from Components.LanguageTasks import GetHighlight
 from Components.GeminiVision import GetHighlightFromVideo
-from Components.FaceCrop import crop_to_vertical, combine_videos
+from Components.FaceCrop import crop_to_vertical, combine_videos, OUTPUT_RESOLUTIONS
+from Components.Instrumentation import trace_stage, export_traces
 
 def print_menu():
     print("\n" + "="*60)
@@ -52,13 +53,31 @@ def select_vision_model():
     
     return models.get(choice, "gemini-2.5-flash-002")
 
+def select_output_resolution():
+    print("\nSelect Output Resolution:")
+    print("1. 1080x1920 (Full HD) - Default")
+    print("2. 720x1280 (HD) - Smaller files, faster encode")
+    print("3. Source resolution - No scaling, size depends on the video")
+    
+    choice = input("\nEnter choice (1-3, default=1): ").strip() or "1"
+    
+    sizes = {
+        "1": OUTPUT_RESOLUTIONS["1080p"],
+        "2": OUTPUT_RESOLUTIONS["720p"],
+        "3": None
+    }
+    
+    return sizes.get(choice, OUTPUT_RESOLUTIONS["1080p"])
+
 def main():
     print_menu()
     
     mode = input("\nEnter mode (1 or 2, default=1): ").strip() or "1"
+    output_size = select_output_resolution()
     
     url = input("\nEnter YouTube video URL: ")
-    Vid = download_youtube_video(url)
+    with trace_stage("download"):
+        Vid = download_youtube_video(url)
     
     if not Vid:
         print("Unable to Download the video")
@@ -76,7 +95,8 @@ def main():
         model = select_vision_model()
         
         try:
-            start, stop = GetHighlightFromVideo(Vid, model)
+            with trace_stage("highlight", mode="vision", model=model):
+                start, stop = GetHighlightFromVideo(Vid, model)
         except Exception as e:
             print(f"Error in vision mode: {e}")
             return
@@ -86,40 +106,42 @@ def main():
         print("\n--- Transcript Mode: Transcribing audio first ---")
         model = select_transcript_model()
         
-        Audio = extractAudio(Vid)
+        with trace_stage("audio"):
+            Audio = extractAudio(Vid)
         if not Audio:
             print("No audio file found")
             return
         
-        transcriptions = transcribeAudio(Audio)
+        with trace_stage("transcript"):
+            transcriptions = transcribeAudio(Audio)
         if len(transcriptions) == 0:
             print("No transcriptions found")
             return
         
-        TransText = ""
-        for text, time_start, time_end in transcriptions:
-            TransText += (f"{time_start} - {time_end}: {text}")
-        
         try:
-            start, stop = GetHighlight(TransText, model)
+            with trace_stage("highlight", mode="transcript", model=model):
+                start, stop = GetHighlight(transcriptions, model, audio_path=Audio)
         except Exception as e:
             print(f"Error in transcript mode: {e}")
             return
     
     # Process the highlight
     if start is not None and stop is not None and start >= 0 and stop > 0 and stop > start:
-        print(f"\n✓ Highlight identified: {start}s - {stop}s (duration: {stop-start}s)")
+        print(f"\n✓ Highlight identified: {start}s - {stop}s (duration: {stop-start:.2f}s)")
         
         Output = "Out.mp4"
         print("\nCropping video to highlight...")
-        crop_video(Vid, Output, start, stop)
+        with trace_stage("clip"):
+            crop_video(Vid, Output, start, stop, max_height=output_size[1] if output_size else None)
         
         croped = "croped.mp4"
         print("Creating vertical format...")
-        crop_to_vertical("Out.mp4", croped)
+        with trace_stage("vertical"):
+            crop_to_vertical("Out.mp4", croped, output_size)
         
         print("Combining videos...")
-        combine_videos("Out.mp4", croped, "Final.mp4")
+        with trace_stage("render"):
+            combine_videos("Out.mp4", croped, "Final.mp4")
         
         print("\n" + "="*60)
         print("✓ SUCCESS! Your short has been created: Final.mp4")
@@ -128,4 +150,8 @@ def main():
         print("Error in getting highlight")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        # Writes metrics.json and trace.json when run with SHORTS_TRACE=1
+        export_traces()
\ No newline at end of file
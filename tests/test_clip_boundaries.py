@@ -0,0 +1,64 @@
+import pytest
+
+from Components.ClipBoundaries import refine_boundaries, boundary_points, MIN_CLIP, PAD
+
+
+def words_segment(text, start, step=0.5):
+    # Segment with evenly spaced word timestamps, the shape transcribeAudio returns
+    words = [(word, round(start + i * step, 3), round(start + (i + 1) * step - 0.05, 3))
+             for i, word in enumerate(text.split())]
+    return [text, start, words[-1][2], words]
+
+
+THREE_SENTENCES = [
+    ["First sentence here.", 0.0, 2.0],
+    ["Second one now.", 2.0, 3.0],
+    ["Third part ends.", 4.0, 6.0],
+]
+
+
+def test_snaps_to_sentence_boundaries():
+    transcriptions = [
+        words_segment("We start here today.", 0.0),
+        words_segment("This is the part worth keeping in the clip.", 2.5),
+        words_segment("And then it goes on.", 8.0),
+    ]
+    assert refine_boundaries(2.6, 6.8, transcriptions) == pytest.approx((2.5 - PAD, 6.95 + PAD))
+
+
+def test_tiny_range_is_kept():
+    # Used to come back as a clip in the next sentence that dropped the whole request
+    assert refine_boundaries(3.2, 3.3, THREE_SENTENCES) == (3.2, 3.3)
+
+
+def test_refined_range_must_cover_most_of_the_original():
+    # Both cuts would move into the third sentence, leaving less than half of the range
+    assert refine_boundaries(3.1, 4.5, THREE_SENTENCES) == (3.1, 4.5)
+
+
+def test_result_never_shorter_than_min_clip_unless_unchanged():
+    for start, end in [(3.2, 3.3), (2.9, 4.1), (0.5, 1.0)]:
+        refined = refine_boundaries(start, end, THREE_SENTENCES)
+        assert refined == (start, end) or refined[1] - refined[0] >= MIN_CLIP
+
+
+def test_snapping_does_not_grow_past_max_duration():
+    transcriptions = [
+        ["Opening line.", 0.0, 9.0],
+        ["A long stretch of talk that runs on", 9.0, 69.0],
+        ["and finally stops.", 69.0, 70.5],
+    ]
+    start, end = refine_boundaries(10.0, 69.9, transcriptions)
+    assert end - start <= 60
+    assert (start, end) == (10.0, 69.9)
+
+
+def test_longer_original_may_stay_long():
+    transcriptions = [["One.", 0.0, 1.0], ["Two.", 1.0, 80.0]]
+    start, end = refine_boundaries(0.2, 79.5, transcriptions)
+    assert end - start > 60
+
+
+def test_no_transcript_keeps_the_range():
+    assert boundary_points([])["sentence_starts"] == []
+    assert refine_boundaries(5.0, 20.0, []) == (5.0, 20.0)